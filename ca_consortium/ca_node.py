@@ -1,29 +1,105 @@
 from __future__ import annotations
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
-from wallet.bekd_crypto import H2, serialize_point
+from ca_consortium.replay_store import USED, HelperCache, MemoryReplayStore, SharedReplayStore
+from wallet.bekd_crypto import H2, Point, glv_recode, is_on_curve, point_mul, serialize_point, token_id
+from wallet.wire import (
+    CONTENT_TYPE,
+    JSON_TYPE,
+    check_request_id,
+    decode_enroll_request,
+    decode_retrieve_request,
+    encode_enroll_response,
+    encode_retrieve_response,
+)
 
 
-def create_app(node_index: int, node_share: int):
+def _binary_request() -> bool:
+    return request.mimetype == CONTENT_TYPE
+
+
+def _json_retrieve_request(data) -> tuple[bytes, list, str | None]:
+    # the JSON twin of decode_retrieve_request; R0 is checked by the caller
+    if not isinstance(data, dict) or not isinstance(data.get('rho'), str) or len(data['rho']) != 64:
+        raise ValueError("rho must be 64 hex characters")
+    rho = bytes.fromhex(data['rho'])
+    if len(rho) != 32:
+        raise ValueError("rho must be 64 hex characters")
+    return rho, data.get('R0'), check_request_id(data.get('request_id'))
+
+
+def _binary_reply() -> bool:
+    # answer in the request's format unless Accept says otherwise
+    if not request.accept_mimetypes:
+        return _binary_request()
+    offered = [CONTENT_TYPE, JSON_TYPE] if _binary_request() else [JSON_TYPE, CONTENT_TYPE]
+    return request.accept_mimetypes.best_match(offered) == CONTENT_TYPE
+
+
+def create_app(
+    node_index: int,
+    node_share: int,
+    pk_ca: tuple[int, int] | None = None,
+    helper_cache: HelperCache | None = None,
+    replay: MemoryReplayStore | SharedReplayStore | None = None,
+):
     app = Flask(__name__)
-    local_used: set[str] = set()
+    # pre-forked workers pass a SharedReplayStore so all of them see the same burns
+    replay = replay if replay is not None else MemoryReplayStore(helper_cache)
+    app.extensions['bekd_replay'] = replay
+    # the share never changes, so its GLV split and wNAF digits and its verification
+    # share are computed once, before any pre-forked worker starts
+    share_recoding = glv_recode(node_share)
+    public_body = {"node": node_index, "verification_share": list(point_mul(node_share))}
+    if pk_ca is not None:
+        public_body["pk_ca"] = [pk_ca[0], pk_ca[1]]
+
+    @app.get('/public')
+    def public():
+        return jsonify(public_body)
 
     @app.post('/enroll')
     def enroll():
-        data = request.get_json(force=True)
+        if _binary_request():
+            try:
+                hA = decode_enroll_request(request.get_data())
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+        else:
+            hA = int(request.get_json(force=True)['hA'])
         # simulate partial signature share response
-        return jsonify({"node": node_index, "partial_sig": hex((node_share + int(data['hA'])) % (2**256))})
+        partial_sig = (node_share + hA) % (2**256)
+        if _binary_reply():
+            return Response(encode_enroll_response(node_index, partial_sig), mimetype=CONTENT_TYPE)
+        return jsonify({"node": node_index, "partial_sig": hex(partial_sig)})
 
     @app.post('/retrieve')
     def retrieve():
-        data = request.get_json(force=True)
-        rho = data['rho']
-        if rho in local_used:
+        try:
+            if _binary_request():
+                rho_bytes, R0, request_id = decode_retrieve_request(request.get_data())
+            else:
+                rho_bytes, R0, request_id = _json_retrieve_request(request.get_json(force=True))
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        rho = rho_bytes.hex()
+        # share*R0 for an off-curve R0 lands on a weaker curve and leaks the share
+        if not is_on_curve(R0):
+            return jsonify({"error": "invalid-R0"}), 400
+        R0 = Point(R0[0], R0[1])
+        # rho is what gets burned, so it has to be the token's id and not any string
+        # the client picks, or one R0 would yield helpers without limit
+        if rho != token_id(R0).hex():
+            return jsonify({"error": "rho-mismatch"}), 400
+        helper = replay.claim(rho, request_id)
+        if helper == USED:
             return jsonify({"error": "token-used"}), 400
-        local_used.add(rho)
-        R0 = tuple(data['R0'])
-        helper = serialize_point((R0[0], R0[1]))
-        return jsonify({"node": node_index, "helper": helper.hex()})
+        if not isinstance(helper, Point):
+            helper = Point.of(point_mul(share_recoding, R0))
+            replay.remember(rho, request_id, helper)
+        if _binary_reply():
+            return Response(encode_retrieve_response(node_index, helper), mimetype=CONTENT_TYPE)
+        return jsonify({"node": node_index, "helper": serialize_point(helper).hex()})
 
     return app
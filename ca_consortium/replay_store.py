@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from wallet.bekd_crypto import Point, serialize_point
+from wallet.locks import ContentionLock
+
+HELPER_TTL_SECONDS = 30.0
+HELPER_CACHE_SIZE = 4096
+
+# claim() outcomes besides a cached helper
+NEW = 'new'
+USED = 'used'
+
+
+class HelperCache:
+    """Helpers already served, keyed by (rho, request id).
+
+    A client that retries /retrieve with the same request id gets the stored
+    helper back instead of token-used. Entries expire after ``ttl`` seconds and
+    at most ``max_entries`` are kept, oldest evicted first. Not thread-safe;
+    the node serialises access.
+    """
+
+    def __init__(self, ttl: float = HELPER_TTL_SECONDS, max_entries: int = HELPER_CACHE_SIZE, clock=time.monotonic):
+        if max_entries <= 0:
+            raise ValueError('max_entries must be > 0')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Point]] = OrderedDict()
+
+    def get(self, rho: str, request_id: str) -> Point | None:
+        self._expire()
+        entry = self._entries.get((rho, request_id))
+        return entry[1] if entry is not None else None
+
+    def put(self, rho: str, request_id: str, helper: Point):
+        self._expire()
+        self._entries[(rho, request_id)] = (self.clock() + self.ttl, helper)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expire(self):
+        # insertion order is expiry order, since every entry gets the same ttl
+        now = self.clock()
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MemoryReplayStore:
+    """Burned rhos and retry helpers for a node served from one process.
+
+    ``claim`` burns rho and returns NEW (the caller computes the helper and
+    calls ``remember``), returns the cached helper for a retry, or USED. A retry
+    that arrives while the first request is still computing gets NEW again, so
+    the lock is never held across the scalar multiplication.
+    """
+
+    def __init__(self, helper_cache: HelperCache | None = None):
+        self.used: set[str] = set()
+        self.helpers = helper_cache if helper_cache is not None else HelperCache()
+        self.lock = ContentionLock()
+        self._pending: set[tuple[str, str]] = set()
+
+    def claim(self, rho: str, request_id: str | None) -> Point | str:
+        with self.lock:
+            if request_id is not None:
+                cached = self.helpers.get(rho, request_id)
+                if cached is not None:
+                    return cached
+                if (rho, request_id) in self._pending:
+                    return NEW
+            if rho in self.used:
+                return USED
+            self.used.add(rho)
+            if request_id is not None:
+                self._pending.add((rho, request_id))
+            return NEW
+
+    def remember(self, rho: str, request_id: str | None, helper: Point):
+        if request_id is None:
+            return
+        with self.lock:
+            self._pending.discard((rho, request_id))
+            self.helpers.put(rho, request_id, helper)
+
+
+class SharedReplayStore:
+    """The MemoryReplayStore contract, backed by one SQLite file.
+
+    Every pre-forked worker of a node opens the same file, so a rho burned by
+    one worker is used for all of them and a retry may land on any worker.
+    Burned rhos are kept for good; the request id and helper of a row are
+    cleared once they expire or more than ``max_helpers`` are cached.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = HELPER_TTL_SECONDS,
+        max_helpers: int = HELPER_CACHE_SIZE,
+        clock=time.time,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_helpers = max_helpers
+        self.clock = clock
+        self.lock = ContentionLock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        with self._db() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS burned (rho TEXT PRIMARY KEY, request_id TEXT, helper BLOB, expires REAL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS burned_expires ON burned (expires)')
+
+    def _db(self) -> sqlite3.Connection:
+        # a connection must not cross fork(), so each worker opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._conn
+
+    def claim(self, rho: str, request_id: str | None) -> Point | str:
+        now = self.clock()
+        with self.lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                row = db.execute('SELECT request_id, helper, expires FROM burned WHERE rho = ?', (rho,)).fetchone()
+                if row is None:
+                    expires = now + self.ttl if request_id is not None else None
+                    db.execute('INSERT INTO burned VALUES (?, ?, NULL, ?)', (rho, request_id, expires))
+                    result = NEW
+                elif request_id is not None and row[0] == request_id and row[2] is not None and row[2] > now:
+                    # still computing on another worker: recompute rather than fail the retry
+                    result = Point.from_bytes(row[1]) if row[1] is not None else NEW
+                else:
+                    result = USED
+            finally:
+                db.execute('COMMIT')
+        return result
+
+    def remember(self, rho: str, request_id: str | None, helper: Point):
+        if request_id is None:
+            return
+        now = self.clock()
+        with self.lock:
+            db = self._db()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute(
+                    'UPDATE burned SET helper = ?, expires = ? WHERE rho = ? AND request_id = ?',
+                    (serialize_point(helper), now + self.ttl, rho, request_id),
+                )
+                db.execute(
+                    'UPDATE burned SET request_id = NULL, helper = NULL, expires = NULL WHERE expires <= ? OR rho IN '
+                    '(SELECT rho FROM burned WHERE expires IS NOT NULL ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+                    (now, self.max_helpers),
+                )
+            finally:
+                db.execute('COMMIT')
+
+    def cached_helpers(self) -> int:
+        with self.lock:
+            return self._db().execute('SELECT COUNT(*) FROM burned WHERE helper IS NOT NULL').fetchone()[0]
+
+
+def default_state_dir() -> Path:
+    shm = Path('/dev/shm')
+    return shm if shm.is_dir() else Path(tempfile.gettempdir())
@@ -1,27 +1,116 @@
 from __future__ import annotations
 
+import argparse
 import multiprocessing
+import resource
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from werkzeug.serving import make_server
 
 from ca_consortium.ca_node import create_app
-from ca_consortium.ca_config import default_ports
-from ca_consortium.threshold_crypto import run_simulated_dkg
+from ca_consortium.ca_config import NodeConfig, default_ports
+from ca_consortium.replay_store import SharedReplayStore, default_state_dir
+from ca_consortium.threshold_crypto import DKGResult, dkg_from_dict
+from wallet.token_storage import SNAPSHOT_FILE, load_snapshot
+from wallet.wallet_client import BEKDWallet
+
+
+def rss_kib() -> dict[str, int]:
+    # RssFile is mostly the interpreter and shared libraries, shared between processes
+    try:
+        with open('/proc/self/status') as f:
+            fields = dict(line.split(':', 1) for line in f if line.startswith(('VmRSS', 'RssAnon', 'RssFile')))
+        return {k: int(v.split()[0]) for k, v in fields.items()}
+    except OSError:
+        return {'VmRSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
 
 
-def run_node(index: int, port: int, share: int):
-    app = create_app(index, share)
-    app.run(host='0.0.0.0', port=port)
+def load_dkg(path: Path = SNAPSHOT_FILE) -> DKGResult:
+    # the nodes serve the shares of the wallet's snapshot, so helpers they return
+    # recombine under the CA key the wallet enrolled with
+    snapshot = load_snapshot(path)
+    if snapshot is None:
+        return BEKDWallet.from_snapshot(path).dkg
+    return dkg_from_dict(snapshot['dkg'])
+
+
+def run_node(
+    cfg: NodeConfig,
+    pk_ca: tuple[int, int],
+    workers: int = 1,
+    reports=None,
+    state_dir: Path | None = None,
+):
+    st = time.perf_counter()
+    replay = SharedReplayStore(state_dir / f'node{cfg.index}.sqlite') if workers > 1 else None
+    app = create_app(cfg.index, cfg.share, pk_ca, replay=replay)
+    # bind once here; every pre-forked worker accepts on the same listening socket
+    server = make_server('0.0.0.0', cfg.port, app, threaded=True)
+    report = {'node': cfg.index, 'port': server.port, 'startup_ms': (time.perf_counter() - st) * 1000, **rss_kib()}
+    if reports is not None:
+        reports.put(report)
+    if workers == 1:
+        server.serve_forever()
+        return
+    # a fixed pool forked after start-up, so workers inherit the share recoding and
+    # verification share copy-on-write; werkzeug's processes=N would fork (and
+    # forget) per request instead
+    ctx = multiprocessing.get_context('fork')
+    pool = [ctx.Process(target=server.serve_forever, daemon=True) for _ in range(workers)]
+    for p in pool:
+        p.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in pool:
+            p.join()
+    finally:
+        for p in pool:
+            if p.is_alive():
+                p.terminate()
 
 
 def main():
-    dkg = run_simulated_dkg(3)
+    parser = argparse.ArgumentParser(description='Start the CA consortium nodes')
+    parser.add_argument('--workers', type=int, default=1, help='pre-forked worker processes per node')
+    parser.add_argument(
+        '--snapshot', type=Path, default=SNAPSHOT_FILE, help='consortium snapshot shared with the wallet'
+    )
+    args = parser.parse_args()
+
+    dkg = load_dkg(args.snapshot)
     ports = default_ports()
+    if len(dkg.shares) > len(ports):
+        parser.error(f'the snapshot has {len(dkg.shares)} nodes but only {len(ports)} ports are configured')
+
+    # per-node replay stores shared by that node's workers
+    state_dir = Path(tempfile.mkdtemp(prefix='bekd-replay-', dir=default_state_dir()))
+    reports = multiprocessing.Queue()
     procs = []
-    for i, share in enumerate(dkg.shares, start=1):
-        p = multiprocessing.Process(target=run_node, args=(i, ports[i - 1], share.share))
-        p.start()
-        procs.append(p)
-    for p in procs:
-        p.join()
+    try:
+        for i, share in enumerate(dkg.shares, start=1):
+            cfg = NodeConfig(index=i, port=ports[i - 1], share=share.share)
+            p = multiprocessing.Process(target=run_node, args=(cfg, dkg.public_key, args.workers, reports, state_dir))
+            p.start()
+            procs.append(p)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        for _ in procs:
+            r = reports.get()
+            print(
+                f"node {r['node']} :{r['port']} startup={r['startup_ms']:.1f}ms "
+                f"rss={r['VmRSS']}KiB anon={r.get('RssAnon', '-')}KiB file={r.get('RssFile', '-')}KiB"
+            )
+        for p in procs:
+            p.join()
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        shutil.rmtree(state_dir, ignore_errors=True)
 
 
 if __name__ == '__main__':
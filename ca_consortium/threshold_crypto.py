@@ -3,10 +3,7 @@ from __future__ import annotations
 import secrets
 from dataclasses import dataclass
 
-from eth_keys import keys
-from py_ecc.secp256k1.secp256k1 import G, N, add, multiply
-
-from wallet.bekd_crypto import lagrange_coefficients_at_zero
+from wallet.bekd_crypto import N, interpolate_zero, lagrange_coefficients_at_zero, point_add, point_mul, poly_eval, shamir_poly
 
 
 @dataclass
@@ -22,33 +19,60 @@ class DKGResult:
     shares: list[CANodeShare]
 
 
-def run_simulated_dkg(n: int = 3) -> DKGResult:
+def run_simulated_dkg(n: int = 3, t: int = 1) -> DKGResult:
     secret = secrets.randbelow(N - 1) + 1
-    # (t=1,n=3): linear polynomial
-    a1 = secrets.randbelow(N - 1) + 1
+    # degree-t polynomial: any t+1 of the n shares reconstruct
+    coeffs = shamir_poly(secret, t, lambda: secrets.randbelow(N - 1) + 1)
     shares = []
     for i in range(1, n + 1):
-        s = (secret + a1 * i) % N
-        shares.append(CANodeShare(i, s))
-    return DKGResult(master_secret=secret, public_key=multiply(G, secret), shares=shares)
+        shares.append(CANodeShare(i, poly_eval(coeffs, i)))
+    return DKGResult(master_secret=secret, public_key=point_mul(secret), shares=shares)
+
+
+def dkg_to_dict(dkg: DKGResult) -> dict:
+    # the master secret is not written out; the simulated nodes' shares reconstruct it
+    return {
+        "public_key": [dkg.public_key[0], dkg.public_key[1]],
+        "shares": [[s.index, s.share] for s in dkg.shares],
+    }
+
 
+def dkg_from_dict(data: dict) -> DKGResult:
+    shares = [CANodeShare(int(i), int(s)) for i, s in data["shares"]]
+    public_key = tuple(data["public_key"])
+    master_secret = interpolate_zero([(s.index, s.share) for s in shares])
+    if point_mul(master_secret) != public_key:
+        raise ValueError("DKG shares do not match the public key")
+    return DKGResult(master_secret=master_secret, public_key=public_key, shares=shares)
 
-def aggregate_helpers(partials: dict[int, tuple[int, int]]) -> tuple[int, int]:
+
+def partial_helper(R0: tuple[int, int], share: int, glv: bool = True) -> tuple[int, int]:
+    return point_mul(share, R0, glv=glv)
+
+
+def aggregate_helpers(partials: dict[int, tuple[int, int]], glv: bool = True) -> tuple[int, int]:
     coeffs = lagrange_coefficients_at_zero(partials.keys(), N)
     out = None
     for idx, point in partials.items():
-        weighted = multiply(point, coeffs[idx])
-        out = weighted if out is None else add(out, weighted)
+        weighted = point_mul(coeffs[idx], point, glv=glv)
+        out = weighted if out is None else point_add(out, weighted)
     return out
 
 
 def sign_message_with_master(master_secret: int, msg_scalar: int) -> bytes:
+    from eth_keys import keys
+
     priv = keys.PrivateKey(master_secret.to_bytes(32, "big"))
     sig = priv.sign_msg_hash(msg_scalar.to_bytes(32, "big"))
     return sig.to_bytes()
 
 
 def verify_signature(public_key: tuple[int, int], msg_scalar: int, signature: bytes) -> bool:
-    pk = keys.PublicKey(public_key[0].to_bytes(32, "big") + public_key[1].to_bytes(32, "big"))
-    sig = keys.Signature(signature_bytes=signature)
-    return pk.verify_msg_hash(msg_scalar.to_bytes(32, "big"), sig)
+    # plain ECDSA verify on the r||s||v signature, so retrieval never loads eth_keys
+    r = int.from_bytes(signature[:32], "big")
+    s = int.from_bytes(signature[32:64], "big")
+    if not (0 < r < N and 0 < s < N):
+        return False
+    w = pow(s, -1, N)
+    X = point_add(point_mul(msg_scalar * w), point_mul(r * w, public_key))
+    return bool(X[1]) and X[0] % N == r
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
+import gc
+import json
 import platform
 import secrets
 import statistics
+import sys
 import time
+import tracemalloc
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -14,12 +20,32 @@ from Crypto.Hash import keccak
 from eth_keys import keys
 from py_ecc.secp256k1.secp256k1 import G, N, add, multiply
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ca_consortium.threshold_crypto import aggregate_helpers, partial_helper  # noqa: E402
+from wallet.async_client import AsyncBEKDWallet  # noqa: E402
+from wallet.bekd_crypto import batch_point_mul, point_mul  # noqa: E402
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric  # noqa: E402
+from wallet import wire  # noqa: E402
+from wallet.bekd_crypto import Point as ECPoint  # noqa: E402
+from wallet.token_storage import BEKDToken  # noqa: E402
+from wallet.wallet_client import (  # noqa: E402
+    BEKDWallet,
+    ProtocolParams,
+    false_accept_rate,
+    hash_features,
+    match_and_recover,
+    min_tbio,
+)
 
 d = 128
 tbio = 4
 MATCH_COUNT = 120
 NUM_RUNS = 50
 DEFAULT_OUTPUT_CSV = "offchain_benchmark_results.csv"
+DEFAULT_SWEEP_CSV = "offchain_sweep_results.csv"
+DEFAULT_THROUGHPUT_CSV = "offchain_throughput_results.csv"
+SWEEP_RUNS = 5
 
 
 Point = tuple[int, int]
@@ -99,7 +125,8 @@ def summarize(times_ms: list[float]) -> tuple[float, float, float]:
 
 
 def to_feature_bytes(v: float) -> bytes:
-    return format(v, ".8f").encode()
+    # same encoding as wallet.bekd_crypto.H0
+    return repr(float(v)).encode()
 
 
 @dataclass
@@ -130,10 +157,7 @@ def make_context() -> BenchContext:
     pk_ca = multiply(G, sk_ca)
     W = [secrets.randbelow(10_000) / 1000.0 for _ in range(d)]
 
-    match_positions = set(range(MATCH_COUNT))
-    W_prime = []
-    for i, val in enumerate(W):
-        W_prime.append(val if i in match_positions else secrets.randbelow(10_000) / 777.0)
+    W_prime = [val if i < MATCH_COUNT else secrets.randbelow(10_000) / 777.0 for i, val in enumerate(W)]
     return BenchContext(sk_ca=sk_ca, pk_ca=pk_ca, W=W, W_prime=W_prime)
 
 
@@ -279,17 +303,378 @@ def benchmark_threshold_scalability(ctx: BenchContext, art: EnrollmentArtifacts,
     return rows
 
 
+def benchmark_scalar_mul(runs: int) -> list[tuple[str, float, float, float, float]]:
+    base = multiply(G, random_scalar())
+    single = [random_scalar() for _ in range(runs)]
+    batches = [[random_scalar() for _ in range(d)] for _ in range(runs)]
+    cases = [
+        ("Single_pyecc", lambda i: multiply(base, single[i])),
+        ("Single_GLV", lambda i: point_mul(single[i], base)),
+        (f"Batch{d}_pyecc", lambda i: [multiply(base, s) for s in batches[i]]),
+        (f"Batch{d}_GLV", lambda i: batch_point_mul(base, batches[i])),
+    ]
+    rows = []
+    for label, fn in cases:
+        times = []
+        for i in range(runs):
+            st = time.perf_counter()
+            fn(i)
+            times.append((time.perf_counter() - st) * 1000)
+        med, mean, std = summarize(times)
+        baseline = rows[-1][2] if label.endswith("_GLV") else mean
+        rows.append((label, med, mean, std, baseline / mean))
+    return rows
+
+
+SWEEP_HEADER = [
+    "d", "tbio", "match_ratio", "t", "n",
+    "Enroll_median_ms", "Enroll_mean_ms", "Retrieve_median_ms", "Retrieve_mean_ms",
+    "Enroll_peak_KiB", "Retrieve_peak_KiB", "Token_bytes", "Success_rate",
+]
+
+
+def peak_kib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def sweep_point(d_val: int, tbio_val: int, ratio: float, t_val: int, n_val: int, runs: int) -> list:
+    # runs the real wallet path (GLV + batch normalization), tokens kept in memory
+    wallet = BEKDWallet(ProtocolParams(d=d_val, tbio=tbio_val, t=t_val, n=n_val), token_path=None)
+    W = generate_biometric(d_val, seed=7)
+    noisy = generate_noisy_biometric(W, match_ratio=ratio, seed=11)
+
+    enroll_times, retrieve_times, ok = [], [], 0
+    for _ in range(runs):
+        st = time.perf_counter()
+        token = wallet.enroll(W)
+        enroll_times.append((time.perf_counter() - st) * 1000)
+        st = time.perf_counter()
+        ok += wallet.retrieve(noisy, token) is not None
+        retrieve_times.append((time.perf_counter() - st) * 1000)
+
+    enroll_peak = peak_kib(lambda: wallet.enroll(W))
+    token = wallet.enroll(W)
+    retrieve_peak = peak_kib(lambda: wallet.retrieve(noisy, token))
+    token_bytes = len(json.dumps(token.to_dict()).encode())
+    return [
+        d_val, tbio_val, ratio, t_val, n_val,
+        statistics.median(enroll_times), statistics.mean(enroll_times),
+        statistics.median(retrieve_times), statistics.mean(retrieve_times),
+        enroll_peak, retrieve_peak, token_bytes, ok / runs,
+    ]
+
+
+def run_sweep(args: argparse.Namespace) -> None:
+    combos = [
+        (d_val, tbio_val, ratio, t_val, n_val)
+        for d_val in args.d_values
+        for tbio_val in args.tbio_values
+        for ratio in args.match_ratios
+        for t_val, n_val in args.tn
+        if tbio_val <= d_val
+    ]
+    print("=" * 72)
+    print(f"BEKD Parameter Sweep: {len(combos)} combinations, {args.sweep_runs} runs each")
+    print("=" * 72)
+    print(
+        f"{'d':>5} {'tbio':>5} {'ratio':>6} {'(t, n)':>8} {'Enroll (ms)':>12} {'Retrieve (ms)':>14} "
+        f"{'Peak (KiB)':>11} {'Token (B)':>10} {'OK':>5}"
+    )
+    rows = []
+    for d_val, tbio_val, ratio, t_val, n_val in combos:
+        row = sweep_point(d_val, tbio_val, ratio, t_val, n_val, args.sweep_runs)
+        rows.append(row)
+        print(
+            f"{d_val:>5} {tbio_val:>5} {ratio:>6.2f} {f'({t_val},{n_val})':>8} {row[6]:>12.2f} {row[8]:>14.2f} "
+            f"{max(row[9], row[10]):>11.1f} {row[11]:>10} {row[12]:>5.2f}"
+        )
+
+    output_path = Path(args.sweep_output)
+    with output_path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SWEEP_HEADER)
+        writer.writerows(rows)
+    print(f"\nSweep results saved to {output_path}")
+
+
+def throughput_jobs(count: int) -> list[tuple]:
+    jobs = []
+    for seed in range(count):
+        W = generate_biometric(d, seed=seed)
+        jobs.append((W, generate_noisy_biometric(W, match_ratio=0.95, seed=1000 + seed)))
+    return jobs
+
+
+def sync_throughput(jobs: list[tuple], ca_latency: float) -> tuple[float, int]:
+    wallet = BEKDWallet(token_path=None)
+    ok = 0
+    st = time.perf_counter()
+    for W, noisy in jobs:
+        token = wallet.enroll(W)
+        # the blocking client contacts the t+1 quorum nodes one after another
+        time.sleep(ca_latency * len(wallet.quorum()))
+        k = wallet.retrieve(noisy, token)
+        ok += k is not None and wallet.authenticate(k, token=token)
+    return time.perf_counter() - st, ok
+
+
+def async_throughput(jobs: list[tuple], ca_latency: float, concurrency: int, executor_kind: str) -> tuple[float, int]:
+    async def run():
+        client = AsyncBEKDWallet(max_concurrency=concurrency, executor=executor, ca_latency=ca_latency)
+        st = time.perf_counter()
+        results = await client.run_many(jobs)
+        return time.perf_counter() - st, sum(results)
+
+    executor = ProcessPoolExecutor() if executor_kind == "process" else None
+    try:
+        return asyncio.run(run())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def run_throughput(args: argparse.Namespace) -> None:
+    jobs = throughput_jobs(args.flows)
+    latency = args.ca_latency_ms / 1000
+    print("=" * 72)
+    print(
+        f"BEKD Wallet Throughput: {args.flows} enroll/retrieve/authenticate flows, "
+        f"CA RTT={args.ca_latency_ms:.1f} ms, executor={args.executor}"
+    )
+    print("=" * 72)
+    runs = [("sync", 1, sync_throughput(jobs, latency))]
+    runs += [("async", c, async_throughput(jobs, latency, c, args.executor)) for c in args.concurrency]
+    rows = []
+    for mode, concurrency, (elapsed, ok) in runs:
+        rows.append([mode, args.flows, concurrency, args.ca_latency_ms, args.executor, elapsed, args.flows / elapsed, ok])
+    base = rows[0][6]
+    print(f"{'Mode':<6} {'Concurrency':>11} {'Seconds':>9} {'Flows/s':>9} {'Speedup':>8} {'OK':>5}")
+    for mode, _, concurrency, _, _, elapsed, rate, ok in rows:
+        print(f"{mode:<6} {concurrency:>11} {elapsed:>9.2f} {rate:>9.2f} {rate / base:>7.2f}x {ok:>5}")
+
+    output_path = Path(args.throughput_output)
+    with output_path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Mode", "Flows", "Concurrency", "CA_latency_ms", "Executor", "Seconds", "Flows_per_s", "Succeeded"])
+        writer.writerows(rows)
+    print(f"\nThroughput results saved to {output_path}")
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def float_list(value: str) -> list[float]:
+    return [float(v) for v in value.split(",")]
+
+
+def tn_list(value: str) -> list[tuple[int, int]]:
+    pairs = [tuple(int(x) for x in v.split(":")) for v in value.split(",")]
+    if any(t_val + 1 > n_val for t_val, n_val in pairs):
+        raise argparse.ArgumentTypeError("each t:n pair needs t + 1 <= n")
+    return pairs
+
+
+def deep_sizeof(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name)) for name in obj.__slots__)
+    return size
+
+
+def legacy_token_dict(token: BEKDToken, W) -> dict:
+    # token layout before the compact representation: per-feature ints, hex tags, template copy
+    lam = token.lambda_bytes
+    return {
+        "TU": {"c": token.c.hex(), "rho": token.rho.hex()},
+        "TCA": {
+            "R0": [token.R0.x, token.R0.y],
+            "R1": [token.R1.x, token.R1.y],
+            "hA": token.hA,
+            "sigma": token.sigma.hex(),
+            "A": [token.a(j) for j in range(token.d)],
+            "tags": [token.tags[lam * j : lam * (j + 1)].hex() for j in range(token.d)],
+        },
+        "biometric": [float(x) for x in W],
+    }
+
+
+def timed_ms(fn) -> float:
+    st = time.perf_counter()
+    fn()
+    return (time.perf_counter() - st) * 1000
+
+
+def retained_blocks(fn) -> tuple[int, object]:
+    gc.collect()
+    before = sys.getallocatedblocks()
+    result = fn()
+    return sys.getallocatedblocks() - before, result
+
+
+def benchmark_token_representation(runs: int) -> list[tuple[str, float, float, float]]:
+    W = generate_biometric(d, seed=7)
+    token = BEKDWallet(ProtocolParams(d=d, tbio=tbio), token_path=None).enroll(W)
+    legacy = legacy_token_dict(token, W)
+    lam = token.lambda_bytes
+    candidates = [token.tags[lam * j : lam * (j + 1)] if j < MATCH_COUNT else secrets.token_bytes(lam) for j in range(d)]
+    legacy_json = json.dumps(legacy)
+    compact_json = json.dumps(token.to_dict())
+
+    def legacy_retrieve():
+        tca = json.loads(legacy_json)["TCA"]
+        return tca, [j for j in range(d) if candidates[j].hex() == tca["tags"][j]]
+
+    def compact_retrieve():
+        tok = BEKDToken.from_dict(json.loads(compact_json))
+        return tok, [j for j in range(d) if tok.tag_matches(j, candidates[j])]
+
+    legacy_blocks, _ = retained_blocks(legacy_retrieve)
+    compact_blocks, _ = retained_blocks(compact_retrieve)
+    legacy_ms = min(timed_ms(legacy_retrieve) for _ in range(runs))
+    compact_ms = min(timed_ms(compact_retrieve) for _ in range(runs))
+    rows = [
+        ("Token_memory_bytes", deep_sizeof(legacy), deep_sizeof(token)),
+        ("Token_json_bytes", len(legacy_json), len(compact_json)),
+        ("Decode_match_peak_KiB", peak_kib(legacy_retrieve), peak_kib(compact_retrieve)),
+        ("Decode_match_retained_blocks", legacy_blocks, compact_blocks),
+        ("Decode_match_best_ms", legacy_ms, compact_ms),
+    ]
+    return [(name, old, new, old / new if new else 0.0) for name, old, new in rows]
+
+
+def benchmark_feature_encoding(runs: int, bins_values=(0, 16, 64)) -> list[tuple[str, int, int, float, float]]:
+    # hash + match for one capture, the path BEKDWallet.retrieve takes once it has M;
+    # distinct keys is how many H0 and scalar multiplications that capture costs.
+    # Quantized rows run at the smallest tbio that keeps the false-accept rate in bounds.
+    W = generate_biometric(d, seed=7)
+    rows = []
+    for bins in bins_values:
+        bins_tbio = max(tbio, min_tbio(ProtocolParams(d=d, bins=bins)) or d)
+        wallet = BEKDWallet(ProtocolParams(d=d, tbio=bins_tbio, bins=bins), token_path=None)
+        params = wallet.params
+        token = wallet.enroll(W)
+        M = aggregate_helpers({s.index: partial_helper(token.R0, s.share) for s in wallet.quorum()})
+        capture = generate_noisy_biometric(W, match_ratio=0.95, seed=11, jitter=0.005 if bins else 0.0)
+
+        def recover():
+            return match_and_recover(params, token, M, *hash_features(params, capture, token.c))
+
+        if recover() is None:
+            raise RuntimeError(f"feature encoding benchmark failed to recover k (bins={bins})")
+        distinct = len(set(hash_features(params, capture, token.c)[0]))
+        best_ms = min(timed_ms(recover) for _ in range(runs))
+        label = f"Quantized_{bins}" if bins else "Exact_float"
+        rows.append((label, bins_tbio, distinct, false_accept_rate(params), best_ms))
+    return rows
+
+
+def benchmark_wire_format(runs: int, reps: int = 200) -> list[tuple[str, int, int, float, float]]:
+    # bytes on the wire and encode+decode time per message, JSON vs binary
+    W = generate_biometric(d, seed=7)
+    token = BEKDWallet(ProtocolParams(d=d, tbio=tbio), token_path=None).enroll(W)
+    helper = ECPoint.of(point_mul(random_scalar(), token.R0))
+    request_id = secrets.token_hex(16)
+    partial_sig = random_scalar()
+
+    def json_retrieve_request():
+        body = json.dumps({"rho": token.rho.hex(), "R0": [token.R0.x, token.R0.y], "request_id": request_id})
+        data = json.loads(body)
+        return body, (bytes.fromhex(data["rho"]), ECPoint(*data["R0"]), data["request_id"])
+
+    def json_retrieve_response():
+        body = json.dumps({"node": 1, "helper": helper.to_bytes().hex()})
+        return body, ECPoint.from_bytes(bytes.fromhex(json.loads(body)["helper"]))
+
+    def json_enroll_request():
+        body = json.dumps({"hA": token.hA})
+        return body, int(json.loads(body)["hA"])
+
+    def json_enroll_response():
+        body = json.dumps({"node": 1, "partial_sig": hex(partial_sig)})
+        return body, int(json.loads(body)["partial_sig"], 16)
+
+    def json_token():
+        body = json.dumps(token.to_dict())
+        return body, BEKDToken.from_dict(json.loads(body))
+
+    def binary(encode, decode):
+        def run():
+            body = encode()
+            return body, decode(body)
+
+        return run
+
+    messages = [
+        (
+            "Retrieve_request",
+            json_retrieve_request,
+            binary(lambda: wire.encode_retrieve_request(token.rho, token.R0, request_id), wire.decode_retrieve_request),
+        ),
+        (
+            "Retrieve_response",
+            json_retrieve_response,
+            binary(lambda: wire.encode_retrieve_response(1, helper), wire.decode_retrieve_response),
+        ),
+        ("Enroll_request", json_enroll_request, binary(lambda: wire.encode_enroll_request(token.hA), wire.decode_enroll_request)),
+        (
+            "Enroll_response",
+            json_enroll_response,
+            binary(lambda: wire.encode_enroll_response(1, partial_sig), wire.decode_enroll_response),
+        ),
+        ("Token", json_token, binary(lambda: wire.encode_token(token), wire.decode_token)),
+    ]
+
+    def per_message_us(fn):
+        return min(timed_ms(lambda: [fn() for _ in range(reps)]) for _ in range(runs)) * 1000 / reps
+
+    rows = []
+    for name, as_json, as_binary in messages:
+        json_bytes = len(as_json()[0].encode())
+        binary_bytes = len(as_binary()[0])
+        rows.append((name, json_bytes, binary_bytes, per_message_us(as_json), per_message_us(as_binary)))
+    return rows
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="BEKD off-chain benchmark")
     parser.add_argument("--runs", type=int, default=NUM_RUNS, help="iterations per benchmark")
     parser.add_argument("--output", default=DEFAULT_OUTPUT_CSV, help="CSV output path")
+    parser.add_argument("--sweep", action="store_true", help="sweep d, tbio, match ratio and (t, n) instead")
+    parser.add_argument("--d-values", type=int_list, default=[128, 256, 512, 1024], help="comma-separated d values")
+    parser.add_argument("--tbio-values", type=int_list, default=[4, 8, 16], help="comma-separated tbio values")
+    parser.add_argument("--match-ratios", type=float_list, default=[0.95], help="comma-separated match ratios")
+    parser.add_argument("--tn", type=tn_list, default=[(1, 3), (2, 5)], help="comma-separated t:n pairs")
+    parser.add_argument("--sweep-runs", type=int, default=SWEEP_RUNS, help="iterations per sweep combination")
+    parser.add_argument("--sweep-output", default=DEFAULT_SWEEP_CSV, help="sweep CSV output path")
+    parser.add_argument("--throughput", action="store_true", help="compare sync and async wallet flow throughput")
+    parser.add_argument("--flows", type=int, default=16, help="flows per throughput run")
+    parser.add_argument("--concurrency", type=int_list, default=[4, 16], help="comma-separated async concurrency limits")
+    parser.add_argument("--ca-latency-ms", type=float, default=20.0, help="simulated CA round-trip time")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="async EC executor")
+    parser.add_argument("--throughput-output", default=DEFAULT_THROUGHPUT_CSV, help="throughput CSV output path")
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    if args.runs <= 0:
-        raise ValueError("--runs must be > 0")
+    if args.runs <= 0 or args.sweep_runs <= 0:
+        raise ValueError("--runs and --sweep-runs must be > 0")
+    if args.sweep:
+        run_sweep(args)
+        return
+    if args.throughput:
+        run_throughput(args)
+        return
 
     ctx = make_context()
     base_art = enrollment_wallet_once(ctx)
@@ -330,6 +715,37 @@ def main() -> None:
     for t_val, n_val, quorum, med, mean, std in scalability:
         print(f"{f'({t_val},{n_val})':<10} {quorum:>8} {med:>12.2f} {mean:>12.2f} {std:>10.2f}")
 
+    scalar_mul = benchmark_scalar_mul(runs=args.runs)
+    print("\n--- Table C: Variable-Base Scalar Multiplication ---")
+    print(f"{'Method':<18} {'Median (ms)':>12} {'Mean (ms)':>12} {'Std (ms)':>10} {'Speedup':>8}")
+    print("-" * 64)
+    for label, med, mean, std, speedup in scalar_mul:
+        print(f"{label:<18} {med:>12.2f} {mean:>12.2f} {std:>10.2f} {speedup:>7.2f}x")
+
+    token_repr = benchmark_token_representation(runs=args.runs)
+    print("\n--- Table D: Token Representation (legacy dict vs compact) ---")
+    print(f"{'Metric':<30} {'Legacy':>12} {'Compact':>12} {'Ratio':>8}")
+    print("-" * 66)
+    for name, old, new, ratio in token_repr:
+        print(f"{name:<30} {old:>12.2f} {new:>12.2f} {ratio:>7.2f}x")
+
+    encoding = benchmark_feature_encoding(runs=args.runs)
+    print("\n--- Table E: Feature Encoding (hash + match per capture, best of runs) ---")
+    print(f"{'Encoding':<16} {'tbio':>5} {'Distinct':>9} {'FAR':>10} {'Best (ms)':>12}")
+    print("-" * 56)
+    for label, bins_tbio, distinct, far, best_ms in encoding:
+        print(f"{label:<16} {bins_tbio:>5} {distinct:>9} {far:>10.2g} {best_ms:>12.2f}")
+
+    wire_rows = benchmark_wire_format(runs=args.runs)
+    print("\n--- Table F: Wire Format (JSON vs binary, encode+decode per message) ---")
+    print(f"{'Message':<18} {'JSON (B)':>9} {'Binary (B)':>11} {'Ratio':>7} {'JSON (us)':>10} {'Binary (us)':>12}")
+    print("-" * 72)
+    for name, json_bytes, binary_bytes, json_us, binary_us in wire_rows:
+        print(
+            f"{name:<18} {json_bytes:>9} {binary_bytes:>11} {json_bytes / binary_bytes:>6.2f}x "
+            f"{json_us:>10.2f} {binary_us:>12.2f}"
+        )
+
     output_path = Path(args.output)
     with output_path.open("w", newline="") as f:
         writer = csv.writer(f)
@@ -344,6 +760,18 @@ def main() -> None:
         writer.writerow([])
         writer.writerow(["Threshold_t", "Threshold_n", "Quorum", "Median_ms", "Mean_ms", "Std_ms"])
         writer.writerows(scalability)
+        writer.writerow([])
+        writer.writerow(["ScalarMul_method", "Median_ms", "Mean_ms", "Std_ms", "Speedup"])
+        writer.writerows(scalar_mul)
+        writer.writerow([])
+        writer.writerow(["Token_metric", "Legacy", "Compact", "Ratio"])
+        writer.writerows(token_repr)
+        writer.writerow([])
+        writer.writerow(["Feature_encoding", "Tbio", "Distinct_keys", "False_accept_rate", "Best_ms"])
+        writer.writerows(encoding)
+        writer.writerow([])
+        writer.writerow(["Wire_message", "JSON_bytes", "Binary_bytes", "JSON_us", "Binary_us"])
+        writer.writerows(wire_rows)
 
     print(f"\nResults saved to {output_path}")
 
@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from werkzeug.serving import make_server
+
+from ca_consortium.ca_config import NodeConfig
+from ca_consortium.ca_node import create_app
+from ca_consortium.run_consortium import load_dkg, run_node
+from wallet.async_client import AsyncBEKDWallet
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
+from wallet.locks import ContentionLock
+from wallet.wallet_client import BEKDWallet
+
+
+def _jobs(d, count, match_ratio=0.95):
+    for seed in range(count):
+        W = generate_biometric(d, seed=seed)
+        yield W, generate_noisy_biometric(W, match_ratio=match_ratio, seed=100 + seed)
+
+
+def test_run_many_completes_every_flow_under_concurrency_limit():
+    client = AsyncBEKDWallet(max_concurrency=2, ca_latency=0.001)
+    jobs = list(_jobs(client.wallet.params.d, 3)) + list(_jobs(client.wallet.params.d, 1, match_ratio=0.01))
+    assert asyncio.run(client.run_many(jobs, queue_size=1)) == [True, True, True, False]
+
+
+def test_run_many_with_a_process_executor():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        client = AsyncBEKDWallet(executor=executor)
+        assert asyncio.run(client.run_many(list(_jobs(client.wallet.params.d, 2)))) == [True, True]
+
+
+def test_contention_lock_pickles_with_a_fresh_lock():
+    lock = ContentionLock()
+    with lock:
+        copy = pickle.loads(pickle.dumps(lock))
+    assert copy.acquired == 1
+    with copy:
+        assert copy.acquired == 2
+
+
+def test_async_replay_is_rejected():
+    async def flow():
+        client = AsyncBEKDWallet()
+        W, noisy = next(_jobs(client.wallet.params.d, 1))
+        token = await client.enroll(W)
+        k = await client.retrieve(noisy, token)
+        first = await client.authenticate(k, token)
+        return first, await client.authenticate(k, token), await client.retrieve(noisy, token)
+
+    assert asyncio.run(flow()) == (True, False, None)
+
+
+@pytest.mark.parametrize('binary_wire', [True, False])
+def test_helpers_fetched_from_ca_nodes_over_http(binary_wire):
+    client = AsyncBEKDWallet(max_concurrency=2, binary_wire=binary_wire)
+    servers = []
+    for s in client.wallet.quorum():
+        server = make_server('127.0.0.1', 0, create_app(s.index, s.share))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    client.node_urls = [f'http://127.0.0.1:{server.port}' for server in servers]
+    try:
+        assert asyncio.run(client.run_many(_jobs(client.wallet.params.d, 2))) == [True, True]
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+def test_launched_nodes_share_the_wallet_snapshot(tmp_path):
+    # the launcher creates the snapshot; a wallet loaded from it recovers k against the nodes
+    snapshot = tmp_path / 'snapshot.json'
+    dkg = load_dkg(snapshot)
+    ctx = multiprocessing.get_context('fork')
+    reports = ctx.Queue()
+    nodes = [
+        ctx.Process(target=run_node, args=(NodeConfig(s.index, 0, s.share), dkg.public_key, 1, reports))
+        for s in dkg.shares
+    ]
+    for node in nodes:
+        node.start()
+    try:
+        ports = {r['node']: r['port'] for r in (reports.get(timeout=30) for _ in nodes)}
+        client = AsyncBEKDWallet(BEKDWallet.from_snapshot(snapshot))
+        client.node_urls = [f'http://127.0.0.1:{ports[s.index]}' for s in dkg.shares]
+        assert asyncio.run(client.run_many(_jobs(client.wallet.params.d, 1))) == [True]
+    finally:
+        for node in nodes:
+            node.terminate()
+            node.join()
+
+
+def _failing_client(monkeypatch):
+    client = AsyncBEKDWallet(max_concurrency=2)
+
+    async def run_flow(biometric, noisy):
+        raise TimeoutError('helper request timed out')
+
+    monkeypatch.setattr(client, 'run_flow', run_flow)
+    return client
+
+
+def test_run_many_reraises_when_every_worker_fails(monkeypatch):
+    client = _failing_client(monkeypatch)
+    jobs = [(None, None)] * 20
+    with pytest.raises(TimeoutError):
+        asyncio.run(asyncio.wait_for(client.run_many(jobs, queue_size=1), timeout=5))
+
+
+def test_run_many_can_return_exceptions_per_job(monkeypatch):
+    client = _failing_client(monkeypatch)
+    results = asyncio.run(asyncio.wait_for(client.run_many([(None, None)] * 5, return_exceptions=True), timeout=5))
+    assert len(results) == 5
+    assert all(isinstance(r, TimeoutError) for r in results)
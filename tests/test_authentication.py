@@ -1,13 +1,12 @@
-import numpy as np
-
-from wallet.biometric_sim import generate_noisy_biometric
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
 from wallet.wallet_client import BEKDWallet
 
 
 def test_full_flow_authenticate_once():
     wallet = BEKDWallet()
-    token = wallet.enroll()
-    noisy = generate_noisy_biometric(np.array(token['biometric']), match_ratio=0.95, seed=3)
+    W = generate_biometric(wallet.params.d, seed=7)
+    wallet.enroll(W)
+    noisy = generate_noisy_biometric(W, match_ratio=0.95, seed=3)
     k = wallet.retrieve(noisy)
     assert k is not None
     assert wallet.authenticate(k) is True
@@ -0,0 +1,35 @@
+import random
+import secrets
+
+from py_ecc.secp256k1.secp256k1 import G, N, multiply
+
+from wallet.bekd_crypto import GLV_LAMBDA, batch_point_mul, glv_decompose, point_mul
+
+
+def test_batch_point_mul_matches_single_multiplication():
+    M = multiply(G, secrets.randbelow(N - 1) + 1)
+    scalars = [secrets.randbelow(N) for _ in range(16)] + [0, 1, N - 1, N]
+    assert batch_point_mul(M, scalars) == [point_mul(s, M) for s in scalars]
+
+
+def test_batch_point_mul_empty():
+    assert batch_point_mul(G, []) == []
+
+
+def test_glv_point_mul_matches_py_ecc_on_random_vectors():
+    rng = random.Random(2026)
+    for _ in range(64):
+        base = multiply(G, rng.randrange(1, N))
+        s = rng.randrange(0, 2 * N)
+        assert point_mul(s, base) == multiply(base, s % N)
+    for s in (0, 1, 2, N - 1, N, GLV_LAMBDA, 1 << 128):
+        assert point_mul(s) == multiply(G, s % N)
+
+
+def test_glv_decompose_is_short_and_exact():
+    rng = random.Random(7)
+    for _ in range(256):
+        k = rng.randrange(0, N)
+        k1, k2 = glv_decompose(k)
+        assert (k1 + k2 * GLV_LAMBDA) % N == k
+        assert abs(k1).bit_length() <= 129 and abs(k2).bit_length() <= 129
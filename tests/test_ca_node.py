@@ -0,0 +1,103 @@
+from py_ecc.secp256k1.secp256k1 import multiply
+
+from ca_consortium import ca_node
+from ca_consortium.ca_node import HelperCache, create_app
+from ca_consortium.threshold_crypto import run_simulated_dkg
+from wallet.bekd_crypto import G, serialize_point, token_id
+from wallet.wire import MAX_REQUEST_ID_BYTES
+
+BODY = {'rho': token_id(G).hex(), 'R0': [G[0], G[1]]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_retry_with_same_request_id_returns_cached_helper(monkeypatch):
+    client = create_app(1, 12345).test_client()
+    first = client.post('/retrieve', json={**BODY, 'request_id': 'r1'})
+    assert first.status_code == 200
+
+    calls = []
+    monkeypatch.setattr(ca_node, 'point_mul', lambda *a: calls.append(a))
+    retry = client.post('/retrieve', json={**BODY, 'request_id': 'r1'})
+    assert retry.status_code == 200
+    assert retry.get_json()['helper'] == first.get_json()['helper']
+    assert calls == []
+
+    assert client.post('/retrieve', json={**BODY, 'request_id': 'r2'}).get_json() == {'error': 'token-used'}
+    assert client.post('/retrieve', json=BODY).status_code == 400
+
+
+def test_cached_helper_expires_after_ttl():
+    clock = FakeClock()
+    client = create_app(1, 12345, helper_cache=HelperCache(ttl=5.0, clock=clock)).test_client()
+    assert client.post('/retrieve', json={**BODY, 'request_id': 'r1'}).status_code == 200
+    clock.now = 5.0
+    assert client.post('/retrieve', json={**BODY, 'request_id': 'r1'}).status_code == 400
+
+
+def test_helper_cache_is_bounded():
+    cache = HelperCache(max_entries=2)
+    for i in range(3):
+        cache.put(f'rho{i}', 'r', f'h{i}')
+    assert len(cache) == 2
+    assert cache.get('rho0', 'r') is None
+    assert cache.get('rho2', 'r') == 'h2'
+
+
+def test_off_curve_or_infinite_R0_is_rejected(monkeypatch):
+    client = create_app(1, 12345).test_client()
+    calls = []
+    monkeypatch.setattr(ca_node, 'point_mul', lambda *a: calls.append(a))
+    for R0 in ([2, 3], [0, 0], [G[0], G[1] + 1], ['1', '2'], [G[0]]):
+        resp = client.post('/retrieve', json={**BODY, 'R0': R0})
+        assert resp.status_code == 400
+        assert resp.get_json() == {'error': 'invalid-R0'}
+    assert calls == []
+    # the rejected requests did not burn rho
+    monkeypatch.undo()
+    assert client.post('/retrieve', json=BODY).status_code == 200
+
+
+def test_node_serves_helper_and_verification_share():
+    dkg = run_simulated_dkg(3)
+    share = dkg.shares[0].share
+    client = create_app(1, share, dkg.public_key).test_client()
+    R0 = multiply(G, 424242)
+
+    resp = client.post('/retrieve', json={'rho': token_id(R0).hex(), 'R0': list(R0)})
+    assert resp.get_json()['helper'] == serialize_point(multiply(R0, share)).hex()
+    public = client.get('/public').get_json()
+    assert tuple(public['verification_share']) == multiply(G, share)
+    assert tuple(public['pk_ca']) == dkg.public_key
+
+
+def test_rho_must_be_the_token_id_of_R0(monkeypatch):
+    client = create_app(1, 12345).test_client()
+    calls = []
+    monkeypatch.setattr(ca_node, 'point_mul', lambda *a: calls.append(a))
+    resp = client.post('/retrieve', json={**BODY, 'rho': 'cd' * 32})
+    assert resp.get_json() == {'error': 'rho-mismatch'}
+    assert calls == []
+
+
+def test_retrieve_rejects_malformed_json_fields():
+    client = create_app(1, 12345).test_client()
+    for body in (
+        {'R0': BODY['R0']},
+        {**BODY, 'rho': 'zz' * 32},
+        {**BODY, 'rho': BODY['rho'][:-2] + ' 0'},
+        {**BODY, 'rho': 42},
+        {**BODY, 'request_id': {}},
+        {**BODY, 'request_id': 'x' * (MAX_REQUEST_ID_BYTES + 1)},
+        [BODY],
+    ):
+        assert client.post('/retrieve', json=body).status_code == 400
+    # upper-case hex is the same rho, so it is burned along with the lower-case one
+    assert client.post('/retrieve', json={**BODY, 'rho': BODY['rho'].upper()}).status_code == 200
+    assert client.post('/retrieve', json=BODY).get_json() == {'error': 'token-used'}
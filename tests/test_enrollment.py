@@ -1,8 +1,22 @@
+from wallet import token_storage
 from wallet.wallet_client import BEKDWallet
 
 
 def test_enrollment_creates_token():
     wallet = BEKDWallet()
     token = wallet.enroll()
-    assert 'TU' in token and 'TCA' in token
-    assert len(token['TCA']['A']) == wallet.params.d
+    assert token.d == wallet.params.d
+    assert len(token.tags) == wallet.params.d * wallet.params.lambda_bytes
+    assert token_storage.load_token() == token
+
+
+def test_tag_matches_requires_exact_tag_length():
+    wallet = BEKDWallet(token_path=None)
+    token = wallet.enroll()
+    lam = token.lambda_bytes
+    first, second = token.tags[:lam], token.tags[lam : 2 * lam]
+    assert token.tag_matches(0, first)
+    assert not token.tag_matches(0, b'')
+    assert not token.tag_matches(0, first[:-1])
+    assert not token.tag_matches(0, first + second)
+    assert not token.tag_matches(token.d, b'\0' * lam)
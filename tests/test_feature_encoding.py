@@ -0,0 +1,49 @@
+import pytest
+
+from ca_consortium.threshold_crypto import aggregate_helpers, partial_helper
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
+from wallet.feature_encoding import QuantizedEncoder
+from wallet.wallet_client import BEKDWallet, ProtocolParams, false_accept_rate, hash_features, match_and_recover
+
+
+def test_encoder_clips_and_supports_per_feature_bins():
+    assert QuantizedEncoder(bins=8).encode([-9.0, -4.0, 0.0, 3.99, 9.0]) == [0, 0, 4, 7, 7]
+    assert QuantizedEncoder(bins=[2, 4], lo=0.0, hi=1.0).encode([0.6, 0.6]) == [1, 2]
+
+
+def test_quantized_retrieval_tolerates_jitter():
+    wallet = BEKDWallet(ProtocolParams(bins=16, tbio=40), token_path=None)
+    W = generate_biometric(wallet.params.d, seed=7)
+    token = wallet.enroll(W)
+    noisy = generate_noisy_biometric(W, match_ratio=0.95, seed=11, jitter=0.005)
+    k = wallet.retrieve(noisy, token)
+    assert k is not None
+    assert wallet.authenticate(k, token=token)
+
+
+def test_repeated_values_in_a_capture_are_hashed_once():
+    wallet = BEKDWallet(ProtocolParams(bins=16, tbio=40), token_path=None)
+    W = generate_biometric(wallet.params.d, seed=7)
+    token = wallet.enroll(W)
+    M = aggregate_helpers({s.index: partial_helper(token.R0, s.share) for s in wallet.quorum()})
+    keys, hashed = hash_features(wallet.params, W, token.c)
+    assert len(keys) == wallet.params.d
+    assert list(hashed) == list(dict.fromkeys(keys))
+    assert len(hashed) <= 16
+    assert match_and_recover(wallet.params, token, M, keys, hashed) is not None
+
+
+@pytest.mark.parametrize('bins, tbio', [(16, 40), (64, 18)])
+def test_quantized_token_rejects_unrelated_biometrics(bins, tbio):
+    wallet = BEKDWallet(ProtocolParams(bins=bins, tbio=tbio), token_path=None)
+    assert false_accept_rate(wallet.params) <= wallet.params.max_false_accept
+    token = wallet.enroll(generate_biometric(wallet.params.d, seed=7))
+    for s in range(10):
+        assert wallet.retrieve(generate_biometric(wallet.params.d, seed=1000 + s), token) is None
+
+
+def test_quantized_params_without_a_bounded_false_accept_rate_are_refused():
+    with pytest.raises(ValueError, match='at least 40'):
+        BEKDWallet(ProtocolParams(bins=16, tbio=4), token_path=None)
+    with pytest.raises(ValueError, match='no tbio'):
+        BEKDWallet(ProtocolParams(d=8, bins=4, tbio=4), token_path=None)
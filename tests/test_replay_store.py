@@ -0,0 +1,67 @@
+import multiprocessing
+import secrets
+
+import requests
+
+from ca_consortium.ca_config import NodeConfig
+from ca_consortium.replay_store import NEW, USED, SharedReplayStore
+from ca_consortium.run_consortium import run_node
+from ca_consortium.threshold_crypto import run_simulated_dkg
+from wallet.bekd_crypto import G, N, Point, point_mul, token_id
+
+
+def _claim_all(path, rhos):
+    store = SharedReplayStore(path)
+    return [rho for rho in rhos if store.claim(rho, None) == NEW]
+
+
+def test_shared_store_burns_once_across_processes(tmp_path):
+    path = tmp_path / 'node.sqlite'
+    SharedReplayStore(path)
+    rhos = [secrets.token_hex(32) for _ in range(50)]
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        burned = pool.starmap(_claim_all, [(path, rhos)] * 4)
+    assert sorted(rho for chunk in burned for rho in chunk) == sorted(rhos)
+
+
+def test_retry_on_another_worker_gets_cached_helper(tmp_path):
+    first, second = SharedReplayStore(tmp_path / 'node.sqlite'), SharedReplayStore(tmp_path / 'node.sqlite')
+    helper = Point(*G)
+    assert first.claim('ab', 'r1') == NEW
+    # retry while the first worker is still computing: recompute instead of token-used
+    assert second.claim('ab', 'r1') == NEW
+    first.remember('ab', 'r1', helper)
+    assert second.claim('ab', 'r1') == helper
+    assert second.claim('ab', 'r2') == USED
+    assert second.claim('ab', None) == USED
+
+
+def test_shared_store_expires_and_bounds_helpers(tmp_path):
+    now = [0.0]
+    store = SharedReplayStore(tmp_path / 'node.sqlite', ttl=5.0, max_helpers=2, clock=lambda: now[0])
+    for rho in ('a', 'b', 'c'):
+        assert store.claim(rho, 'r') == NEW
+        store.remember(rho, 'r', Point(*G))
+    assert store.cached_helpers() == 2
+    now[0] = 10.0
+    assert store.claim('c', 'r') == USED
+
+
+def test_preforked_node_burns_rho_once_across_workers(tmp_path):
+    dkg = run_simulated_dkg(3)
+    cfg = NodeConfig(index=1, port=0, share=dkg.shares[0].share)
+    ctx = multiprocessing.get_context('fork')
+    reports = ctx.Queue()
+    node = ctx.Process(target=run_node, args=(cfg, dkg.public_key, 3, reports, tmp_path))
+    node.start()
+    try:
+        url = f"http://127.0.0.1:{reports.get(timeout=30)['port']}/retrieve"
+        R0 = point_mul(secrets.randbelow(N - 1) + 1)
+        body = {'rho': token_id(R0).hex(), 'R0': list(R0)}
+        codes = [requests.post(url, json={**body, 'request_id': f'r{i}'}, timeout=10).status_code for i in range(9)]
+        assert sorted(codes) == [200] + [400] * 8
+        # the first request id is still served from the shared helper cache
+        assert requests.post(url, json={**body, 'request_id': f'r{codes.index(200)}'}, timeout=10).status_code == 200
+    finally:
+        node.terminate()
+        node.join()
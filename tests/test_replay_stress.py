@@ -0,0 +1,225 @@
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from Crypto.Hash import keccak
+
+from ca_consortium.ca_node import create_app
+from wallet.bekd_crypto import N, point_mul, token_id
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
+from wallet.wallet_client import BEKDWallet, MockSpentSet
+from wallet.wire import CONTENT_TYPE, encode_retrieve_request
+
+SEED = 20240601
+THREADS = 16
+RPC_URL = 'http://127.0.0.1:8545'
+ARTIFACTS = Path(__file__).resolve().parents[1] / 'artifacts' / 'contracts'
+
+
+def _attempts(rhos, attempts: int, seed: int = SEED) -> list:
+    # every rho appears at least once, the rest are duplicates, in a seeded order
+    rng = random.Random(seed)
+    order = list(rhos) + [rng.choice(rhos) for _ in range(attempts - len(rhos))]
+    rng.shuffle(order)
+    return order
+
+
+def _random_rhos(count: int, seed: int = SEED) -> list[bytes]:
+    rng = random.Random(seed)
+    return [rng.randbytes(32) for _ in range(count)]
+
+
+@contextmanager
+def _fine_grained_switching():
+    # force the interpreter to switch threads often so check-then-burn races would surface
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def _hammer(burn, order: list, threads: int = THREADS) -> tuple[list[tuple], float]:
+    barrier = threading.Barrier(threads)
+    results: list[list[tuple]] = [[] for _ in range(threads)]
+
+    def run(i):
+        barrier.wait()
+        results[i] = [(rho, burn(rho)) for rho in order[i::threads]]
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    with _fine_grained_switching():
+        st = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - st
+    return [outcome for chunk in results for outcome in chunk], elapsed
+
+
+def _assert_exactly_once(outcomes: list[tuple], rhos: list) -> int:
+    burned = Counter(rho for rho, ok in outcomes if ok)
+    assert set(burned) == set(rhos)
+    assert set(burned.values()) == {1}
+    return len(burned)
+
+
+def _report(backend: str, attempts: int, burns: int, elapsed: float, lock_stats: dict | None = None):
+    line = f'[replay-stress] {backend}: attempts={attempts} burns={burns} burns/s={burns / elapsed:.0f}'
+    if lock_stats is not None:
+        line += f" contended={lock_stats['contended']}/{lock_stats['acquired']} wait={lock_stats['wait_ms']:.2f}ms"
+    print(line)
+
+
+def test_mock_spent_set_burns_each_rho_once_under_contention():
+    spent = MockSpentSet()
+
+    def burn(rho):
+        try:
+            spent.mark_used(rho)
+        except ValueError:
+            return False
+        return True
+
+    rhos = _random_rhos(500)
+    order = _attempts(rhos, 5000)
+    outcomes, elapsed = _hammer(burn, order)
+    burns = _assert_exactly_once(outcomes, rhos)
+    assert spent.used == set(rhos)
+    assert spent.lock.acquired == len(order)
+    _report('MockSpentSet', len(order), burns, elapsed, spent.lock.stats())
+
+
+def test_wallet_retrieve_and_authenticate_succeed_once_per_token():
+    wallet = BEKDWallet(token_path=None)
+    W = generate_biometric(wallet.params.d, seed=7)
+    tokens = [wallet.enroll(W) for _ in range(4)]
+    noisy = generate_noisy_biometric(W, match_ratio=0.95, seed=11)
+    by_rho = {token.rho: token for token in tokens}
+    order = _attempts(list(by_rho), 48)
+    keys = {}
+
+    def retrieve(rho):
+        k = wallet.retrieve(noisy, by_rho[rho])
+        if k is not None:
+            keys[rho] = k
+        return k is not None
+
+    outcomes, elapsed = _hammer(retrieve, order, threads=8)
+    _assert_exactly_once(outcomes, list(by_rho))
+    _report('BEKDWallet.retrieve', len(order), len(keys), elapsed, wallet._ca_local_lock.stats())
+
+    outcomes, elapsed = _hammer(lambda rho: wallet.authenticate(keys[rho], token=by_rho[rho]), order, threads=8)
+    _assert_exactly_once(outcomes, list(by_rho))
+    _report('BEKDWallet.authenticate', len(order), len(tokens), elapsed, wallet.spent_set.lock.stats())
+
+
+def test_ca_node_replay_set_burns_each_rho_once_under_contention():
+    app = create_app(1, 12345)
+    clients = threading.local()
+    ids = itertools.count()
+
+    def burn(rho):
+        if not hasattr(clients, 'client'):
+            clients.client = app.test_client()
+        # a fresh request id per attempt, so only the first attempt per rho may succeed
+        body = encode_retrieve_request(rho, R0s[rho], f'attempt-{next(ids)}')
+        resp = clients.client.post('/retrieve', data=body, headers={'Content-Type': CONTENT_TYPE})
+        assert resp.status_code in (200, 400)
+        return resp.status_code == 200
+
+    # nodes only burn rho = token_id(R0), so every rho needs its own R0
+    rng = random.Random(SEED)
+    R0s = {token_id(R0): R0 for R0 in (point_mul(rng.randrange(1, N)) for _ in range(100))}
+    rhos = list(R0s)
+    order = _attempts(rhos, 1000)
+    outcomes, elapsed = _hammer(burn, order)
+    burns = _assert_exactly_once(outcomes, rhos)
+    _report('ca_node /retrieve', len(order), burns, elapsed, app.extensions['bekd_replay'].lock.stats())
+
+
+def _rpc(method: str, *params):
+    import requests
+
+    payload = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': list(params)}
+    resp = requests.post(RPC_URL, json=payload, timeout=10)
+    body = resp.json()
+    if 'error' in body:
+        raise RuntimeError(body['error'])
+    return body['result']
+
+
+def _evm_available() -> bool:
+    if not (ARTIFACTS / 'SpentSet.sol' / 'SpentSet.json').exists():
+        return False
+    try:
+        _rpc('eth_chainId')
+    except Exception:
+        return False
+    return True
+
+
+def _selector(signature: str) -> str:
+    return keccak.new(digest_bits=256, data=signature.encode()).hexdigest()[:8]
+
+
+def _mined(tx_hash: str) -> dict:
+    # the hardhat config mines on a 12 s interval, so mine explicitly instead of waiting
+    _rpc('evm_mine')
+    return _rpc('eth_getTransactionReceipt', tx_hash)
+
+
+def _deploy(sender: str, name: str, arg: str) -> str:
+    artifact = json.loads((ARTIFACTS / f'{name}.sol' / f'{name}.json').read_text())
+    data = artifact['bytecode'] + arg[2:].lower().rjust(64, '0')
+    return _mined(_rpc('eth_sendTransaction', {'from': sender, 'data': data, 'gas': hex(3_000_000)}))[
+        'contractAddress'
+    ]
+
+
+@pytest.mark.skipif(not _evm_available(), reason='needs a local EVM at 127.0.0.1:8545 and compiled artifacts')
+def test_evm_spent_set_burns_each_rho_once_under_contention():
+    sender = _rpc('eth_accounts')[0]
+    authorization = _deploy(sender, 'Authorization', sender)
+    spent_set = _deploy(sender, 'SpentSet', authorization)
+    allow = '0x' + _selector('setAuthorized(address,bool)') + sender[2:].lower().rjust(64, '0') + '1'.rjust(64, '0')
+    assert _mined(_rpc('eth_sendTransaction', {'from': sender, 'to': authorization, 'data': allow}))['status'] == '0x1'
+
+    tx_hashes = {}
+    lock = threading.Lock()
+
+    def submit(rho):
+        data = '0x' + _selector('markUsed(bytes32)') + rho.hex()
+        # fixed gas: estimation would already revert for duplicates seen by a mined block
+        tx = {'from': sender, 'to': spent_set, 'data': data, 'gas': hex(100_000)}
+        try:
+            tx_hash = _rpc('eth_sendTransaction', tx)
+        except RuntimeError:
+            return False
+        with lock:
+            tx_hashes[tx_hash] = rho
+        return True
+
+    rhos = _random_rhos(50)
+    order = _attempts(rhos, 200)
+    st = time.perf_counter()
+    _hammer(submit, order, threads=8)
+    receipts = {tx_hash: _mined(tx_hash) for tx_hash in tx_hashes}
+    elapsed = time.perf_counter() - st
+
+    outcomes = [(rho, receipts[tx_hash]['status'] == '0x1') for tx_hash, rho in tx_hashes.items()]
+    burns = _assert_exactly_once(outcomes, rhos)
+    used = '0x' + _selector('used(bytes32)')
+    for rho in rhos:
+        assert int(_rpc('eth_call', {'to': spent_set, 'data': used + rho.hex()}, 'latest'), 16) == 1
+    print(f'[replay-stress] SpentSet (EVM): reverted duplicates={len(tx_hashes) - burns}')
+    _report('SpentSet (EVM)', len(order), burns, elapsed)
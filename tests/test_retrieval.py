@@ -1,20 +1,31 @@
 import numpy as np
 
-from wallet.biometric_sim import generate_noisy_biometric
+from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
 from wallet.wallet_client import BEKDWallet
 
 
 def test_retrieval_success_with_matching_features():
     wallet = BEKDWallet()
-    token = wallet.enroll()
-    noisy = generate_noisy_biometric(np.array(token['biometric']), match_ratio=0.95, seed=11)
+    W = generate_biometric(wallet.params.d, seed=7)
+    wallet.enroll(W)
+    noisy = generate_noisy_biometric(W, match_ratio=0.95, seed=11)
     k = wallet.retrieve(noisy)
     assert k is not None
 
 
 def test_retrieval_fails_with_low_matching_features():
     wallet = BEKDWallet()
-    token = wallet.enroll()
-    noisy = generate_noisy_biometric(np.array(token['biometric']), match_ratio=0.01, seed=17)
+    W = generate_biometric(wallet.params.d, seed=7)
+    wallet.enroll(W)
+    noisy = generate_noisy_biometric(W, match_ratio=0.01, seed=17)
     k = wallet.retrieve(noisy)
     assert k is None
+
+
+def test_noisy_capture_is_reproducible_per_seed():
+    # reference: one normal per non-matching feature, drawn in index order
+    W = generate_biometric(128, seed=7)
+    rng = np.random.default_rng(11)
+    matched = set(rng.choice(128, int(0.95 * 128), replace=False).tolist())
+    expected = np.array([W[i] if i in matched else rng.normal(0, 1) + 0.1 for i in range(128)])
+    assert np.array_equal(generate_noisy_biometric(W, match_ratio=0.95, seed=11), expected)
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from wallet.token_storage import save_snapshot
+from wallet.wallet_client import BEKDWallet
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_wallet_client_import_skips_heavy_modules():
+    probe = (
+        "import sys, wallet.wallet_client; "
+        "print(','.join(m for m in ('numpy', 'eth_keys', 'py_ecc') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ''
+
+
+def test_snapshot_roundtrip_keeps_consortium(tmp_path):
+    path = tmp_path / 'snapshot.json'
+    first = BEKDWallet.from_snapshot(path)
+    second = BEKDWallet.from_snapshot(path)
+    assert second.dkg == first.dkg
+    assert second.params == first.params
+
+
+def test_snapshot_is_private_and_omits_master_secret(tmp_path):
+    path = tmp_path / 'snapshot.json'
+    wallet = BEKDWallet.from_snapshot(path)
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert str(wallet.dkg.master_secret) not in path.read_text()
+
+    # rewriting an existing world-readable file tightens it too
+    path.chmod(0o644)
+    save_snapshot(wallet.snapshot(), path)
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_timing_reports_wall_clock_import_time(tmp_path):
+    cmd = [sys.executable, '-m', 'wallet.wallet_client', '--action', 'enroll', '--timing']
+    cmd += ['--snapshot', str(tmp_path / 'snapshot.json')]
+    env = {**os.environ, 'PYTHONPATH': str(ROOT)}
+    out = subprocess.run(cmd, cwd=tmp_path, env=env, capture_output=True, text=True, check=True).stdout
+    timing = dict(field.split('=', 1) for field in out.splitlines()[-1].split()[1:])
+    assert float(timing['imports'].removesuffix('ms')) > 0
+    assert {'snapshot', 'work', 'since_exec'} <= set(timing)
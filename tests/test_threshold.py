@@ -1,6 +1,12 @@
-from py_ecc.secp256k1.secp256k1 import G, add, eq, multiply
+from py_ecc.secp256k1.secp256k1 import G, add, multiply
 
-from ca_consortium.threshold_crypto import run_simulated_dkg
+from ca_consortium.threshold_crypto import (
+    aggregate_helpers,
+    partial_helper,
+    run_simulated_dkg,
+    sign_message_with_master,
+    verify_signature,
+)
 from wallet.bekd_crypto import lagrange_coefficients_at_zero
 
 
@@ -15,4 +21,25 @@ def test_threshold_helper_aggregation_matches_master():
     for idx, part in partials.items():
         weighted = multiply(part, coeffs[idx])
         out = weighted if out is None else add(out, weighted)
-    assert eq(out, multiply(R0, dkg.master_secret))
+    assert out == multiply(R0, dkg.master_secret)
+
+
+def test_aggregate_helpers_glv_matches_reference():
+    dkg = run_simulated_dkg(3)
+    R0 = multiply(G, 987654321)
+    partials = {s.index: partial_helper(R0, s.share) for s in dkg.shares[1:]}
+    assert aggregate_helpers(partials) == aggregate_helpers(partials, glv=False) == multiply(R0, dkg.master_secret)
+
+
+def test_verify_signature_accepts_eth_keys_signatures():
+    dkg = run_simulated_dkg(3)
+    sigma = sign_message_with_master(dkg.master_secret, 424242)
+    assert verify_signature(dkg.public_key, 424242, sigma)
+    assert not verify_signature(dkg.public_key, 424243, sigma)
+
+
+def test_dkg_threshold_degree_follows_t():
+    dkg = run_simulated_dkg(5, t=2)
+    R0 = multiply(G, 31337)
+    partials = {s.index: partial_helper(R0, s.share) for s in dkg.shares[2:]}
+    assert aggregate_helpers(partials) == multiply(R0, dkg.master_secret)
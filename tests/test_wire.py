@@ -0,0 +1,79 @@
+import secrets
+
+import pytest
+
+from ca_consortium.ca_node import create_app
+from wallet.bekd_crypto import G, Point, compress_point, point_mul, token_id
+from wallet.biometric_sim import generate_biometric
+from wallet.wallet_client import BEKDWallet
+from wallet.wire import (
+    CONTENT_TYPE,
+    MAX_REQUEST_ID_BYTES,
+    decode_retrieve_request,
+    decode_retrieve_response,
+    decode_token,
+    encode_retrieve_request,
+    encode_token,
+    pack,
+    unpack,
+)
+
+
+def test_compressed_points_round_trip():
+    for _ in range(20):
+        p = point_mul(secrets.randbelow(2**256))
+        assert Point.from_compressed(compress_point(p)) == p
+    assert Point.from_compressed(compress_point((0, 0))) == (0, 0)
+    with pytest.raises(ValueError):
+        Point.from_compressed(b'\x02' + (5).to_bytes(32, 'big'))  # x^3 + 7 has no root mod P
+
+
+def test_token_round_trip_and_size():
+    wallet = BEKDWallet(token_path=None)
+    token = wallet.enroll(generate_biometric(wallet.params.d, seed=7))
+    data = encode_token(token)
+    assert decode_token(data).to_dict() == token.to_dict()
+    # A and tags dominate; everything else is 9 length prefixes and a few fixed fields
+    assert len(data) == 1 + 9 * 4 + 32 + 32 + 33 + 33 + 32 + len(token.sigma) + len(token.A) + len(token.tags) + 1
+
+
+def test_unpack_rejects_malformed_messages():
+    msg = pack(b'ab', b'c')
+    assert unpack(msg, 2) == [b'ab', b'c']
+    for bad in (msg[:-1], msg + b'x', b'\x09' + msg[1:]):
+        with pytest.raises(ValueError):
+            unpack(bad, 2)
+
+
+def test_ca_node_negotiates_binary_and_json():
+    client = create_app(1, 12345).test_client()
+    rho = token_id(G)
+    binary = client.post(
+        '/retrieve', data=encode_retrieve_request(rho, G, 'r1'), headers={'Content-Type': CONTENT_TYPE}
+    )
+    assert binary.mimetype == CONTENT_TYPE
+    node, helper = decode_retrieve_response(binary.data)
+    assert node == 1 and helper == point_mul(12345, G)
+
+    # the JSON retry of the same request id gets the same helper, uncompressed hex
+    retry = client.post('/retrieve', json={'rho': rho.hex(), 'R0': list(G), 'request_id': 'r1'})
+    assert Point.from_bytes(bytes.fromhex(retry.get_json()['helper'])) == helper
+
+    for path in ('/retrieve', '/enroll'):
+        bad = client.post(path, data=b'\x01junk', headers={'Content-Type': CONTENT_TYPE})
+        assert bad.status_code == 400
+
+
+def test_retrieve_request_id_is_bounded():
+    rho = token_id(G)
+    assert decode_retrieve_request(encode_retrieve_request(rho, G, 'x' * MAX_REQUEST_ID_BYTES))[2] is not None
+    for request_id in (b'x' * (MAX_REQUEST_ID_BYTES + 1), b'\xff'):
+        with pytest.raises(ValueError):
+            decode_retrieve_request(pack(rho, compress_point(G), request_id))
+
+
+def test_binary_retrieve_rejects_infinity():
+    client = create_app(1, 12345).test_client()
+    body = encode_retrieve_request(secrets.token_bytes(32), (0, 0), 'r1')
+    resp = client.post('/retrieve', data=body, headers={'Content-Type': CONTENT_TYPE})
+    assert resp.status_code == 400
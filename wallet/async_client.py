@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import secrets
+from concurrent.futures import Executor
+from typing import Iterable
+
+from ca_consortium.threshold_crypto import CANodeShare, aggregate_helpers, partial_helper
+from wallet.bekd_crypto import Point
+from wallet.token_storage import BEKDToken
+from wallet.wallet_client import BEKDWallet, hash_features, match_and_recover, sign_user_op
+from wallet.wire import CONTENT_TYPE, decode_retrieve_response, encode_retrieve_request
+
+DEFAULT_USER_OP_HASH = b'userop-hash'.ljust(32, b'\0')
+
+
+def fetch_helper(
+    url: str,
+    token: BEKDToken,
+    timeout: float,
+    request_id: str | None = None,
+    retries: int = 1,
+    binary: bool = True,
+) -> Point:
+    import requests
+
+    # nodes burn rho on first sight; resending the same request id after a timeout
+    # gets the node's cached helper back instead of token-used
+    request_id = request_id or secrets.token_hex(16)
+    if binary:
+        body = {'data': encode_retrieve_request(token.rho, token.R0, request_id)}
+        headers = {'Content-Type': CONTENT_TYPE, 'Accept': CONTENT_TYPE}
+    else:
+        body = {'json': {'rho': token.rho.hex(), 'R0': [token.R0.x, token.R0.y], 'request_id': request_id}}
+        headers = {}
+    for attempt in range(retries + 1):
+        try:
+            resp = requests.post(f'{url}/retrieve', headers=headers, timeout=timeout, **body)
+            break
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+    resp.raise_for_status()
+    if binary:
+        return decode_retrieve_response(resp.content)[1]
+    return Point.from_bytes(bytes.fromhex(resp.json()['helper']))
+
+
+class AsyncBEKDWallet:
+    """asyncio front-end to BEKDWallet.
+
+    EC work runs in an executor, CA helper calls to the quorum run concurrently,
+    and at most ``max_concurrency`` operations are in flight. Replay bookkeeping
+    stays on the event-loop thread.
+    """
+
+    def __init__(
+        self,
+        wallet: BEKDWallet | None = None,
+        *,
+        max_concurrency: int = 8,
+        executor: Executor | None = None,
+        node_urls: list[str] | None = None,
+        ca_latency: float = 0.0,
+        timeout: float = 5.0,
+        retries: int = 1,
+        binary_wire: bool = True,
+    ):
+        if max_concurrency <= 0:
+            raise ValueError('max_concurrency must be > 0')
+        self.wallet = wallet or BEKDWallet(token_path=None)
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        # node_urls[i - 1] serves CA node i; without URLs helpers are computed
+        # locally from the simulated shares, after an optional simulated RTT
+        self.node_urls = node_urls
+        self.ca_latency = ca_latency
+        self.timeout = timeout
+        self.retries = retries
+        # binary_wire=False talks JSON to the nodes, for debugging with plain HTTP tools
+        self.binary_wire = binary_wire
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def _cpu(self, fn, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def enroll(self, biometric=None) -> BEKDToken:
+        async with self._slots:
+            return await self._cpu(self.wallet.enroll, biometric)
+
+    async def retrieve(self, noisy_biometric, token: BEKDToken) -> int | None:
+        async with self._slots:
+            return await self._retrieve(noisy_biometric, token)
+
+    async def authenticate(self, k: int, token: BEKDToken, user_op_hash: bytes = DEFAULT_USER_OP_HASH) -> bool:
+        async with self._slots:
+            return await self._authenticate(k, token, user_op_hash)
+
+    async def run_flow(self, biometric, noisy_biometric) -> bool:
+        async with self._slots:
+            token = await self._cpu(self.wallet.enroll, biometric)
+            k = await self._retrieve(noisy_biometric, token)
+            return k is not None and await self._authenticate(k, token, DEFAULT_USER_OP_HASH)
+
+    async def run_many(
+        self, jobs: Iterable[tuple], queue_size: int | None = None, return_exceptions: bool = False
+    ) -> list:
+        # Bounded hand-off queue: the producer blocks once queue_size jobs are waiting,
+        # so a long (or lazy) job iterable never turns into an unbounded task backlog.
+        # A failing flow stops the run and re-raises, unless return_exceptions puts the
+        # exception in that job's slot instead (as asyncio.gather does).
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or 2 * self.max_concurrency)
+        results: dict[int, object] = {}
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                i, (biometric, noisy) = item
+                try:
+                    results[i] = await self.run_flow(biometric, noisy)
+                except Exception as exc:
+                    if not return_exceptions:
+                        raise
+                    results[i] = exc
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        running = set(workers)
+
+        async def feed(item):
+            # a put waits on a full queue; watch the workers meanwhile, or a dead pool
+            # would leave the producer blocked forever
+            put = asyncio.ensure_future(queue.put(item))
+            while True:
+                done, _ = await asyncio.wait({put, *running}, return_when=asyncio.FIRST_COMPLETED)
+                for w in done - {put}:
+                    running.discard(w)
+                    if w.exception() is not None:
+                        put.cancel()
+                        raise w.exception()
+                if put in done:
+                    return
+
+        count = 0
+        try:
+            for i, job in enumerate(jobs):
+                await feed((i, job))
+                count = i + 1
+            for _ in workers:
+                await feed(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+        return [results[i] for i in range(count)]
+
+    async def _retrieve(self, noisy_biometric, token: BEKDToken) -> int | None:
+        if not await self._cpu(self.wallet.verify_token, token) or not self.wallet.burn_local(token.rho):
+            return None
+        # hash the capture while the CA round trip is in flight
+        hashing = self._cpu(hash_features, self.wallet.params, noisy_biometric, token.c)
+        M = await self._helper(token)
+        keys, hashed = await hashing
+        return await self._cpu(match_and_recover, self.wallet.params, token, M, keys, hashed)
+
+    async def _helper(self, token: BEKDToken) -> tuple[int, int]:
+        quorum = self.wallet.quorum()
+        if self.node_urls:
+            request_id = secrets.token_hex(16)
+            calls = (
+                asyncio.to_thread(
+                    fetch_helper,
+                    self.node_urls[s.index - 1],
+                    token,
+                    self.timeout,
+                    request_id,
+                    self.retries,
+                    self.binary_wire,
+                )
+                for s in quorum
+            )
+        else:
+            calls = (self._local_helper(s, token) for s in quorum)
+        helpers = await asyncio.gather(*calls)
+        return await self._cpu(aggregate_helpers, {s.index: h for s, h in zip(quorum, helpers)})
+
+    async def _local_helper(self, share: CANodeShare, token: BEKDToken) -> tuple[int, int]:
+        if self.ca_latency:
+            await asyncio.sleep(self.ca_latency)
+        return await self._cpu(partial_helper, token.R0, share.share)
+
+    async def _authenticate(self, k: int, token: BEKDToken, user_op_hash: bytes) -> bool:
+        if not await self._cpu(sign_user_op, k, token.rho, user_op_hash):
+            return False
+        try:
+            self.wallet.spent_set.mark_used(token.rho)
+        except ValueError:
+            return False
+        return True
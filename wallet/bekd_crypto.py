@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Iterable
 
 from Crypto.Hash import keccak
-from py_ecc.secp256k1.secp256k1 import G, N, add, multiply
+
+# secp256k1 domain parameters; kept local because importing py_ecc pulls in its
+# pairing modules and dominates CLI start-up. py_ecc is only loaded for glv=False.
+P = 2**256 - 2**32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+)
 
 
 def _k256(data: bytes) -> bytes:
@@ -27,10 +36,21 @@ def serialize_point(p: tuple[int, int] | None) -> bytes:
     return serialize_int(p[0]) + serialize_int(p[1])
 
 
+def compress_point(p: tuple[int, int]) -> bytes:
+    # SEC1 compressed form: parity byte + x; infinity as 33 zero bytes
+    if p[0] == 0 and p[1] == 0:
+        return b"\x00" * 33
+    return bytes([2 + (p[1] & 1)]) + serialize_int(p[0])
+
+
 def H0(Wi: float, c: bytes) -> int:
     return _scalar(_k256(b"\x00" + repr(float(Wi)).encode() + c))
 
 
+def H0q(q: int, c: bytes) -> int:
+    return _scalar(_k256(b"\x00" + int(q).to_bytes(4, "big") + c))
+
+
 def H1(M: tuple[int, int], Mwi: tuple[int, int]) -> int:
     return _scalar(_k256(b"\x01" + serialize_point(M) + serialize_point(Mwi)))
 
@@ -52,8 +72,15 @@ def token_id(R0: tuple[int, int]) -> bytes:
 
 
 def lagrange_coefficients_at_zero(indices: Iterable[int], mod: int = N) -> dict[int, int]:
-    idx = list(indices)
-    coeffs: dict[int, int] = {}
+    idx = tuple(indices)
+    return dict(zip(idx, _lagrange_at_zero(idx, mod)))
+
+
+# Retrievals keep landing on the same few index sets (the first tbio matches, the
+# same CA quorum), so the O(k^2) coefficient computation is done once per set.
+@lru_cache(maxsize=1024)
+def _lagrange_at_zero(idx: tuple[int, ...], mod: int) -> tuple[int, ...]:
+    coeffs = []
     for i in idx:
         num, den = 1, 1
         for j in idx:
@@ -61,8 +88,8 @@ def lagrange_coefficients_at_zero(indices: Iterable[int], mod: int = N) -> dict[
                 continue
             num = (num * (-j % mod)) % mod
             den = (den * (i - j)) % mod
-        coeffs[i] = (num * pow(den, -1, mod)) % mod
-    return coeffs
+        coeffs.append((num * pow(den, -1, mod)) % mod)
+    return tuple(coeffs)
 
 
 def shamir_poly(secret: int, degree: int, rand_scalar) -> list[int]:
@@ -82,25 +109,251 @@ def interpolate_zero(points: list[tuple[int, int]], mod: int = N) -> int:
     return sum((y * coeffs[i]) % mod for i, y in points) % mod
 
 
-def point_mul(s: int, p: tuple[int, int] = G) -> tuple[int, int]:
-    return multiply(p, s % N)
+# secp256k1 endomorphism: phi(x, y) = (beta*x, y) = lambda*(x, y)
+GLV_LAMBDA = 0x5363AD4CC05C30E0A5261C028812645A122E22EA20816678DF02967C1B23BD72
+GLV_BETA = 0x7AE96A2B657C07106E64479EAC3434E99CF0497512F58995C1396C28719501EE
+_GLV_A1 = 0x3086D221A7D46BCDE86C90E49284EB15
+_GLV_B1 = -0xE4437ED6010E88286F547FA90ABFE4C3
+_GLV_A2 = 0x114CA50F7A8E2F3F657C1108D9D44CFD8
+_GLV_B2 = _GLV_A1
+WNAF_WIDTH = 5
+
+_INF = (0, 1, 0)
+
+
+def glv_decompose(k: int) -> tuple[int, int]:
+    k %= N
+    c1 = (_GLV_B2 * k + N // 2) // N
+    c2 = (-_GLV_B1 * k + N // 2) // N
+    k1 = k - c1 * _GLV_A1 - c2 * _GLV_A2
+    k2 = -c1 * _GLV_B1 - c2 * _GLV_B2
+    return k1, k2
+
+
+def wnaf(k: int, width: int = WNAF_WIDTH) -> list[int]:
+    full, half = 1 << width, 1 << (width - 1)
+    digits = []
+    while k:
+        d = 0
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half:
+                d -= full
+            k -= d
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def _jdouble(p: tuple[int, int, int]) -> tuple[int, int, int]:
+    X, Y, Z = p
+    if not Z or not Y:
+        return _INF
+    A = (X * X) % P
+    B = (Y * Y) % P
+    C = (B * B) % P
+    D = 2 * ((X + B) ** 2 - A - C) % P
+    E = 3 * A
+    X3 = (E * E - 2 * D) % P
+    return X3, (E * (D - X3) - 8 * C) % P, (2 * Y * Z) % P
+
+
+def _jadd_affine(p: tuple[int, int, int], q: tuple[int, int]) -> tuple[int, int, int]:
+    X1, Y1, Z1 = p
+    if not Z1:
+        return q[0], q[1], 1
+    ZZ = (Z1 * Z1) % P
+    H = (q[0] * ZZ - X1) % P
+    R = (q[1] * ZZ * Z1 - Y1) % P
+    if not H:
+        return _jdouble(p) if not R else _INF
+    HH = (H * H) % P
+    HHH = (H * HH) % P
+    V = (X1 * HH) % P
+    X3 = (R * R - HHH - 2 * V) % P
+    return X3, (R * (V - X3) - Y1 * HHH) % P, (Z1 * H) % P
+
+
+def glv_tables(p: tuple[int, int], width: int = WNAF_WIDTH) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+    # affine odd multiples p, 3p, ... and their images under phi
+    (twice,) = batch_to_affine([_jdouble((p[0], p[1], 1))])
+    odd = [(p[0], p[1], 1)]
+    for _ in range((1 << (width - 2)) - 1):
+        odd.append(_jadd_affine(odd[-1], twice))
+    table = batch_to_affine(odd)
+    return table, [((GLV_BETA * x) % P, y) for x, y in table]
+
+
+def glv_recode(k: int, width: int = WNAF_WIDTH) -> list[tuple[list[int], int, bool]]:
+    # (wNAF digits, table index, negate) per non-zero half of the decomposed scalar
+    k1, k2 = glv_decompose(k)
+    return [(wnaf(abs(ki), width), leg, ki < 0) for leg, ki in enumerate((k1, k2)) if ki]
+
+
+def glv_jacobian_mul(
+    tables: tuple[list[tuple[int, int]], list[tuple[int, int]]],
+    k: int | list[tuple[list[int], int, bool]],
+    width: int = WNAF_WIDTH,
+) -> tuple[int, int, int]:
+    legs = glv_recode(k, width) if isinstance(k, int) else k
+    acc = _INF
+    for i in range(max((len(digits) for digits, _, _ in legs), default=0) - 1, -1, -1):
+        acc = _jdouble(acc)
+        for digits, leg, negate in legs:
+            if i >= len(digits) or not digits[i]:
+                continue
+            d = digits[i]
+            x, y = tables[leg][abs(d) >> 1]
+            acc = _jadd_affine(acc, (x, P - y if (d < 0) != negate else y))
+    return acc
+
+
+def point_mul(
+    s: int | list[tuple[list[int], int, bool]], p: tuple[int, int] = G, glv: bool = True
+) -> tuple[int, int]:
+    # s may also be a glv_recode() result, for callers that multiply by a fixed scalar
+    if not glv:
+        from py_ecc.secp256k1.secp256k1 import multiply
+
+        return multiply(p, s % N)
+    legs = glv_recode(s) if isinstance(s, int) else s
+    if not p[1] or not legs:
+        return (0, 0)
+    return batch_to_affine([glv_jacobian_mul(glv_tables(p), legs)])[0]
 
 
 def point_add(a: tuple[int, int], b: tuple[int, int]) -> tuple[int, int]:
-    return add(a, b)
+    if not a[1]:
+        return b
+    if not b[1]:
+        return a
+    return batch_to_affine([_jadd_affine((a[0], a[1], 1), b)])[0]
+
+
+def is_on_curve(p) -> bool:
+    # affine, finite and on y^2 = x^3 + 7; the Jacobian formulas never use b, so
+    # untrusted points must pass this before any scalar multiplication
+    try:
+        x, y = p
+    except (TypeError, ValueError):
+        return False
+    if type(x) is not int or type(y) is not int or not (0 <= x < P and 0 <= y < P):
+        return False
+    return (x, y) != (0, 0) and (y * y - x * x * x - 7) % P == 0
+
+
+def point_neg(p: tuple[int, int]) -> tuple[int, int]:
+    return (p[0], -p[1] % P)
+
+
+def batch_to_affine(points: list[tuple[int, int, int]]) -> list[tuple[int, int]]:
+    # Montgomery's simultaneous inversion: one modular inverse for the whole batch.
+    prefix, acc = [], 1
+    for _, _, z in points:
+        prefix.append(acc)
+        if z:
+            acc = (acc * z) % P
+    inv_acc = pow(acc, -1, P)
+    out: list[tuple[int, int]] = [(0, 0)] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        x, y, z = points[i]
+        if not z:
+            continue
+        zi = (inv_acc * prefix[i]) % P
+        inv_acc = (inv_acc * z) % P
+        zi2 = (zi * zi) % P
+        out[i] = ((x * zi2) % P, (y * zi2 * zi) % P)
+    return out
+
+
+def batch_point_mul(base: tuple[int, int], scalars: Iterable[int], glv: bool = True) -> list[tuple[int, int]]:
+    if not glv or not base[1]:
+        from py_ecc.secp256k1.secp256k1 import jacobian_multiply, to_jacobian
+
+        jb = to_jacobian(base)
+        return batch_to_affine([jacobian_multiply(jb, s % N) for s in scalars])
+    tables = glv_tables(base)
+    return batch_to_affine([glv_jacobian_mul(tables, s) for s in scalars])
+
+
+class Point:
+    # Affine point with two int slots; indexes like the (x, y) tuples used by the EC
+    # helpers, so it can be passed to them directly.
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def of(cls, p: tuple[int, int]) -> Point:
+        return p if isinstance(p, Point) else cls(p[0], p[1])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Point:
+        return cls(int.from_bytes(data[:32], "big"), int.from_bytes(data[32:64], "big"))
+
+    @classmethod
+    def from_compressed(cls, data: bytes) -> Point:
+        if len(data) != 33 or data[0] not in (0, 2, 3):
+            raise ValueError("expected a 33-byte compressed point")
+        x = int.from_bytes(data[1:], "big")
+        if data[0] == 0:
+            if x:
+                raise ValueError("invalid point encoding")
+            return cls(0, 0)
+        y2 = (pow(x, 3, P) + 7) % P
+        # P = 3 (mod 4), so a square root is a single exponentiation
+        y = pow(y2, (P + 1) // 4, P)
+        if x >= P or y * y % P != y2:
+            raise ValueError("point is not on secp256k1")
+        if (y & 1) != (data[0] & 1):
+            y = P - y
+        return cls(x, y)
+
+    def to_bytes(self) -> bytes:
+        return serialize_point(self)
+
+    def to_compressed(self) -> bytes:
+        return compress_point(self)
+
+    def __getitem__(self, i: int) -> int:
+        if i == 0 or i == -2:
+            return self.x
+        if i == 1 or i == -1:
+            return self.y
+        raise IndexError("Point index out of range")
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Point, tuple)) and len(other) == 2:
+            return self.x == other[0] and self.y == other[1]
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.x, self.y))
+
+    def __repr__(self) -> str:
+        return f"Point({self.x:#x}, {self.y:#x})"
 
 
 @dataclass
 class Envelope:
-    R0: tuple[int, int]
-    R1: tuple[int, int]
-    M: tuple[int, int]
+    R0: Point
+    R1: Point
+    M: Point
     rho: bytes
 
 
 def build_envelope(pk_ca: tuple[int, int], k: int, r: int) -> Envelope:
-    R0 = point_mul(r)
-    M = point_mul(r, pk_ca)
+    R0 = Point.of(point_mul(r))
+    M = Point.of(point_mul(r, pk_ca))
     K = point_mul(k)
-    R1 = point_add(M, K)
+    R1 = Point.of(point_add(M, K))
     return Envelope(R0=R0, R1=R1, M=M, rho=token_id(R0))
@@ -11,14 +11,16 @@ def generate_noisy_biometric(
     noise_std: float = 0.1,
     match_ratio: float = 0.95,
     seed: int | None = None,
+    jitter: float = 0.0,
 ) -> np.ndarray:
     rng = np.random.default_rng(seed)
+    d = len(original)
+    match = np.zeros(d, dtype=bool)
+    match[rng.choice(d, int(match_ratio * d), replace=False)] = True
     noisy = original.copy()
-    n_match = int(match_ratio * len(original))
-    match_indices = set(rng.choice(len(original), n_match, replace=False).tolist())
-    for i in range(len(original)):
-        if i in match_indices:
-            noisy[i] = original[i]
-        else:
-            noisy[i] = rng.normal(0, 1) + noise_std
+    # one draw per non-matching feature, in index order, so a seed gives the same capture as before
+    noisy[~match] = rng.normal(0, 1, size=int((~match).sum())) + noise_std
+    if jitter:
+        # sensor noise on the matching features; only quantized encodings tolerate it
+        noisy[match] += rng.normal(0, jitter, size=int(match.sum()))
     return noisy
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from Crypto.Hash import keccak
-from eth_keys import keys
 
 
 def k256(data: bytes) -> bytes:
@@ -17,10 +16,14 @@ def eip712_typed_hash(rho: bytes, user_op_hash: bytes, chain_id: int, wallet_add
 
 
 def sign_hash(k_scalar: int, digest: bytes) -> bytes:
+    from eth_keys import keys
+
     priv = keys.PrivateKey(k_scalar.to_bytes(32, 'big'))
     return priv.sign_msg_hash(digest).to_bytes()
 
 
 def recover_signer(digest: bytes, signature: bytes) -> bytes:
+    from eth_keys import keys
+
     sig = keys.Signature(signature_bytes=signature)
     return sig.recover_public_key_from_msg_hash(digest).to_canonical_address()
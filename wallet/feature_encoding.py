@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Sequence
+
+
+@dataclass
+class QuantizedEncoder:
+    # bins, lo and hi may be scalars or per-feature sequences
+    bins: int | Sequence[int] = 16
+    lo: float | Sequence[float] = -4.0
+    hi: float | Sequence[float] = 4.0
+
+    def encode(self, biometric) -> list[int]:
+        import numpy as np
+
+        x = np.asarray(biometric, dtype=np.float64)
+        bins = np.asarray(self.bins, dtype=np.int64)
+        lo = np.asarray(self.lo, dtype=np.float64)
+        hi = np.asarray(self.hi, dtype=np.float64)
+        q = np.floor((x - lo) * (bins / (hi - lo)))
+        return np.clip(q, 0, bins - 1).astype(np.int64).tolist()
+
+    def collision_probabilities(self, d: int) -> list[float]:
+        # chance that two unrelated N(0, 1) features (the simulator's model) share a
+        # bucket; the outer buckets also take the clipped tails
+        probs = []
+        for i in range(d):
+            bins, lo, hi = (_at(v, i) for v in (self.bins, self.lo, self.hi))
+            edges = [_normal_cdf(lo + (hi - lo) * j / bins) for j in range(1, bins)]
+            masses = [b - a for a, b in zip([0.0] + edges, edges + [1.0])]
+            probs.append(sum(m * m for m in masses))
+        return probs
+
+
+def _at(value, i: int):
+    return value if isinstance(value, (int, float)) else value[i]
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def collision_tail(collisions: Sequence[float]) -> list[float]:
+    """tail[t] = probability that at least ``t`` features collide (Poisson-binomial).
+
+    An unrelated capture whose features land in the enrolled buckets at ``tbio``
+    positions recovers k, so ``tail[tbio]`` is the false-accept rate of a
+    quantized token.
+    """
+    dist = [1.0]
+    for p in collisions:
+        dist = [a * (1.0 - p) + b * p for a, b in zip(dist + [0.0], [0.0] + dist)]
+    tail, acc = [0.0] * (len(dist) + 1), 0.0
+    for m in range(len(dist) - 1, -1, -1):
+        acc += dist[m]
+        tail[m] = min(acc, 1.0)
+    return tail
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class ContentionLock:
+    """threading.Lock that counts acquisitions and how many of them had to wait.
+
+    Counters are only updated while the lock is held, so they need no lock of
+    their own. A pickled copy (e.g. a wallet sent to a process executor) gets a
+    fresh, unlocked lock and keeps the counters as they were.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_s = 0.0
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> ContentionLock:
+        if not self._lock.acquire(blocking=False):
+            st = time.perf_counter()
+            self._lock.acquire()
+            self.contended += 1
+            self.wait_s += time.perf_counter() - st
+        self.acquired += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def stats(self) -> dict:
+        return {
+            'acquired': self.acquired,
+            'contended': self.contended,
+            'contention_ratio': self.contended / self.acquired if self.acquired else 0.0,
+            'wait_ms': self.wait_s * 1000,
+        }
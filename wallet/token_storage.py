@@ -1,19 +1,96 @@
 from __future__ import annotations
 
 import json
+import os
+from dataclasses import dataclass
 from pathlib import Path
 
+from wallet.bekd_crypto import Point
+
 TOKEN_FILE = Path('.token_store.json')
+SNAPSHOT_FILE = Path('.consortium_snapshot.json')
 
 
-def save_token(token: dict, path: Path = TOKEN_FILE):
-    path.write_text(json.dumps(token))
+@dataclass
+class BEKDToken:
+    # A values and tags live in two contiguous buffers (32 and lambda_bytes bytes per
+    # feature) instead of per-feature ints and hex strings.
+    __slots__ = ('c', 'rho', 'R0', 'R1', 'hA', 'sigma', 'A', 'tags', 'lambda_bytes')
+    c: bytes
+    rho: bytes
+    R0: Point
+    R1: Point
+    hA: int
+    sigma: bytes
+    A: bytes
+    tags: bytes
+    lambda_bytes: int
 
+    @property
+    def d(self) -> int:
+        return len(self.A) // 32
 
-def load_token(path: Path = TOKEN_FILE) -> dict:
-    return json.loads(path.read_text())
+    def a(self, j: int) -> int:
+        return int.from_bytes(self.A[32 * j : 32 * (j + 1)], 'big')
+
+    def tag_matches(self, j: int, tag: bytes) -> bool:
+        # compares in place, without slicing a copy out of the buffer; the length check
+        # keeps short tags from matching a prefix and long ones from spilling into j+1
+        lam = self.lambda_bytes
+        return len(tag) == lam and 0 <= j < self.d and self.tags.startswith(tag, lam * j)
+
+    def to_dict(self) -> dict:
+        return {
+            'TU': {'c': self.c.hex(), 'rho': self.rho.hex()},
+            'TCA': {
+                'R0': [self.R0.x, self.R0.y],
+                'R1': [self.R1.x, self.R1.y],
+                'hA': self.hA,
+                'sigma': self.sigma.hex(),
+                'A': self.A.hex(),
+                'tags': self.tags.hex(),
+                'lambda': self.lambda_bytes,
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> BEKDToken:
+        tca = data['TCA']
+        return cls(
+            c=bytes.fromhex(data['TU']['c']),
+            rho=bytes.fromhex(data['TU']['rho']),
+            R0=Point(*tca['R0']),
+            R1=Point(*tca['R1']),
+            hA=int(tca['hA']),
+            sigma=bytes.fromhex(tca['sigma']),
+            A=bytes.fromhex(tca['A']),
+            tags=bytes.fromhex(tca['tags']),
+            lambda_bytes=int(tca['lambda']),
+        )
+
+
+def save_token(token: BEKDToken, path: Path = TOKEN_FILE):
+    path.write_text(json.dumps(token.to_dict()))
+
+
+def load_token(path: Path = TOKEN_FILE) -> BEKDToken:
+    return BEKDToken.from_dict(json.loads(path.read_text()))
 
 
 def delete_token(path: Path = TOKEN_FILE):
     if path.exists():
         path.unlink()
+
+
+def save_snapshot(snapshot: dict, path: Path = SNAPSHOT_FILE):
+    # the snapshot holds the simulated CA shares, so only the owner may read it
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        os.fchmod(f.fileno(), 0o600)
+        f.write(json.dumps(snapshot))
+
+
+def load_snapshot(path: Path = SNAPSHOT_FILE) -> dict | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
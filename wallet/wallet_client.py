@@ -1,27 +1,58 @@
 from __future__ import annotations
 
 import argparse
+import os
 import secrets
-from dataclasses import dataclass
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
 
-from py_ecc.secp256k1.secp256k1 import G, N, add, eq, multiply, neg
+# wall-clock start of the package imports, for --timing
+_IMPORT_START = time.perf_counter()
 
-from ca_consortium.threshold_crypto import run_simulated_dkg, sign_message_with_master, verify_signature
-from wallet.bekd_crypto import (
+from ca_consortium.threshold_crypto import (  # noqa: E402
+    CANodeShare,
+    DKGResult,
+    aggregate_helpers,
+    dkg_from_dict,
+    dkg_to_dict,
+    partial_helper,
+    run_simulated_dkg,
+    sign_message_with_master,
+    verify_signature,
+)
+from wallet.bekd_crypto import (  # noqa: E402
+    N,
     H0,
+    H0q,
     H1,
     H2,
     H3,
     Htag,
+    batch_point_mul,
     build_envelope,
     interpolate_zero,
+    point_add,
     point_mul,
+    point_neg,
     poly_eval,
     shamir_poly,
 )
-from wallet.biometric_sim import generate_biometric, generate_noisy_biometric
-from wallet.eth_signer import eip712_typed_hash, recover_signer, sign_hash
-from wallet.token_storage import load_token, save_token
+from wallet.eth_signer import eip712_typed_hash, recover_signer, sign_hash  # noqa: E402
+from wallet.feature_encoding import QuantizedEncoder, collision_tail  # noqa: E402
+from wallet.locks import ContentionLock  # noqa: E402
+from wallet.token_storage import (  # noqa: E402
+    SNAPSHOT_FILE,
+    TOKEN_FILE,
+    BEKDToken,
+    load_snapshot,
+    load_token,
+    save_snapshot,
+    save_token,
+)
+
+_IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
 
 
 @dataclass
@@ -31,115 +62,121 @@ class ProtocolParams:
     t: int = 1
     n: int = 3
     lambda_bytes: int = 32
+    # bins > 0 hashes quantized feature values (see QuantizedEncoder) instead of exact floats
+    bins: int = 0
+    quant_lo: float = -4.0
+    quant_hi: float = 4.0
+    # quantized tokens must keep the chance that an unrelated capture unlocks them below this
+    max_false_accept: float = 1e-6
 
 
 class MockSpentSet:
     def __init__(self):
         self.used = set()
+        # check-and-burn must be atomic when authentications run on several threads
+        self.lock = ContentionLock()
 
     def mark_used(self, rho: bytes):
-        if rho in self.used:
-            raise ValueError('Token already spent')
-        self.used.add(rho)
+        with self.lock:
+            if rho in self.used:
+                raise ValueError('Token already spent')
+            self.used.add(rho)
 
 
 class BEKDWallet:
-    def __init__(self, params: ProtocolParams | None = None):
+    def __init__(
+        self,
+        params: ProtocolParams | None = None,
+        dkg: DKGResult | None = None,
+        token_path: Path | None = TOKEN_FILE,
+    ):
         self.params = params or ProtocolParams()
-        self.dkg = run_simulated_dkg(self.params.n)
+        check_false_accept(self.params)
+        self.dkg = dkg or run_simulated_dkg(self.params.n, self.params.t)
+        # token_path=None keeps tokens in memory; callers pass them back explicitly
+        self.token_path = token_path
         self.spent_set = MockSpentSet()
         self._ca_local_used: set[bytes] = set()
+        self._ca_local_lock = ContentionLock()
 
-    def enroll(self, biometric=None) -> dict:
-        W = biometric if biometric is not None else generate_biometric(self.params.d, seed=7)
+    @classmethod
+    def from_snapshot(cls, path: Path = SNAPSHOT_FILE) -> BEKDWallet:
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            wallet = cls()
+            save_snapshot(wallet.snapshot(), path)
+            return wallet
+        return cls(ProtocolParams(**snapshot['params']), dkg_from_dict(snapshot['dkg']))
+
+    def snapshot(self) -> dict:
+        return {'params': asdict(self.params), 'dkg': dkg_to_dict(self.dkg)}
+
+    def enroll(self, biometric=None) -> BEKDToken:
+        if biometric is None:
+            biometric = default_biometric(self.params.d)
+        W = biometric
+        lam = self.params.lambda_bytes
         k = secrets.randbelow(N - 1) + 1
         c = secrets.token_bytes(32)
-        w = [H0(float(W[i]), c) for i in range(self.params.d)]
+        keys, hashed = hash_features(self.params, W, c)
         r = secrets.randbelow(N - 1) + 1
         env = build_envelope(self.dkg.public_key, k, r)
         coeffs = shamir_poly(k, self.params.tbio - 1, lambda: secrets.randbelow(N - 1) + 1)
 
-        A, tags = [], []
+        Z = feature_zis(env.M, keys, hashed)
+        A = bytearray(32 * self.params.d)
+        tags = bytearray(lam * self.params.d)
         for i in range(1, self.params.d + 1):
-            Zi = H1(env.M, point_mul(w[i - 1], env.M))
+            Zi = Z[i - 1]
             Ai = (poly_eval(coeffs, i) + Zi) % N
-            A.append(Ai)
-            tags.append(Htag(i, env.rho, Zi, self.params.lambda_bytes).hex())
+            A[32 * (i - 1) : 32 * i] = Ai.to_bytes(32, 'big')
+            tags[lam * (i - 1) : lam * i] = Htag(i, env.rho, Zi, lam)
 
-        hA = H3(b''.join(x.to_bytes(32, 'big') for x in A) + b''.join(bytes.fromhex(t) for t in tags))
+        hA = H3(bytes(A) + bytes(tags))
         m = H2(env.R0, env.R1, hA)
         sigma = sign_message_with_master(self.dkg.master_secret, m)
         if not verify_signature(self.dkg.public_key, m, sigma):
             raise ValueError('Threshold signature verify failed')
 
-        token = {
-            'TU': {'c': c.hex(), 'rho': env.rho.hex()},
-            'TCA': {
-                'R0': [int(env.R0[0]), int(env.R0[1])],
-                'R1': [int(env.R1[0]), int(env.R1[1])],
-                'hA': int(hA),
-                'sigma': sigma.hex(),
-                'A': A,
-                'tags': tags,
-            },
-            'biometric': [float(x) for x in W],
-        }
-        save_token(token)
+        token = BEKDToken(
+            c=c, rho=env.rho, R0=env.R0, R1=env.R1, hA=hA, sigma=sigma, A=bytes(A), tags=bytes(tags), lambda_bytes=lam
+        )
+        if self.token_path is not None:
+            save_token(token, self.token_path)
         return token
 
-    def retrieve(self, noisy_biometric) -> int | None:
-        token = load_token()
-        c = bytes.fromhex(token['TU']['c'])
-        rho = bytes.fromhex(token['TU']['rho'])
-        tca = token['TCA']
-        R0 = tuple(tca['R0'])
-        R1 = tuple(tca['R1'])
-        hA = int(tca['hA'])
-        sigma = bytes.fromhex(tca['sigma'])
-
-        m = H2(R0, R1, hA)
-        if not verify_signature(self.dkg.public_key, m, sigma):
-            return None
-        if rho in self._ca_local_used:
-            return None
-        self._ca_local_used.add(rho)
+    def _load_token(self, token: BEKDToken | None) -> BEKDToken:
+        return token if token is not None else load_token(self.token_path)
+
+    def verify_token(self, token: BEKDToken) -> bool:
+        m = H2(token.R0, token.R1, token.hA)
+        return verify_signature(self.dkg.public_key, m, token.sigma)
 
+    def burn_local(self, rho: bytes) -> bool:
+        with self._ca_local_lock:
+            if rho in self._ca_local_used:
+                return False
+            self._ca_local_used.add(rho)
+            return True
+
+    def quorum(self) -> list[CANodeShare]:
         # threshold helper combine from any t+1 shares
-        quorum = self.dkg.shares[: self.params.t + 1]
-        partials = {s.index: multiply(R0, s.share) for s in quorum}
-        M = None
-        from wallet.bekd_crypto import lagrange_coefficients_at_zero
-
-        coeffs = lagrange_coefficients_at_zero(partials.keys(), N)
-        for idx, part in partials.items():
-            wpart = multiply(part, coeffs[idx])
-            M = wpart if M is None else add(M, wpart)
-        Kdec = add(R1, neg(M))
-
-        matches = []
-        for i in range(1, self.params.d + 1):
-            wp = H0(float(noisy_biometric[i - 1]), c)
-            Zi = H1(M, point_mul(wp, M))
-            if Htag(i, rho, Zi, self.params.lambda_bytes).hex() == tca['tags'][i - 1]:
-                matches.append((i, Zi))
-        if len(matches) < self.params.tbio:
-            return None
+        return self.dkg.shares[: self.params.t + 1]
 
-        selected = matches[: self.params.tbio]
-        points = [(i, (tca['A'][i - 1] - Zi) % N) for i, Zi in selected]
-        k = interpolate_zero(points)
-        if not eq(point_mul(k), Kdec):
+    def retrieve(self, noisy_biometric, token: BEKDToken | None = None) -> int | None:
+        token = self._load_token(token)
+        if not self.verify_token(token) or not self.burn_local(token.rho):
             return None
-        return k
-
-    def authenticate(self, k: int, user_op_hash: bytes = b'userop-hash'.ljust(32, b'\0')) -> bool:
-        token = load_token()
-        rho = bytes.fromhex(token['TU']['rho'])
-        owner_addr = keys_from_scalar(k).public_key.to_canonical_address()
-        typed = eip712_typed_hash(rho, user_op_hash, 31337, b'wallet-address-123456')
-        sig = sign_hash(k, typed)
-        recovered = recover_signer(typed, sig)
-        if recovered != owner_addr:
+        keys, hashed = hash_features(self.params, noisy_biometric, token.c)
+        partials = {s.index: partial_helper(token.R0, s.share) for s in self.quorum()}
+        M = aggregate_helpers(partials)
+        return match_and_recover(self.params, token, M, keys, hashed)
+
+    def authenticate(
+        self, k: int, user_op_hash: bytes = b'userop-hash'.ljust(32, b'\0'), token: BEKDToken | None = None
+    ) -> bool:
+        rho = self._load_token(token).rho
+        if not sign_user_op(k, rho, user_op_hash):
             return False
         try:
             self.spent_set.mark_used(rho)
@@ -148,33 +185,159 @@ class BEKDWallet:
         return True
 
 
+def encoder(params: ProtocolParams) -> QuantizedEncoder:
+    return QuantizedEncoder(params.bins, params.quant_lo, params.quant_hi)
+
+
+def false_accept_rate(params: ProtocolParams) -> float:
+    # exact-float keys only collide on bit-identical values, which the model treats as never
+    if not params.bins:
+        return 0.0
+    tail = collision_tail(encoder(params).collision_probabilities(params.d))
+    return tail[params.tbio] if params.tbio < len(tail) else 0.0
+
+
+def min_tbio(params: ProtocolParams) -> int | None:
+    """Smallest tbio whose false-accept rate is within ``max_false_accept``, or None if no tbio <= d is."""
+    if not params.bins:
+        return 1
+    tail = collision_tail(encoder(params).collision_probabilities(params.d))
+    return next((t for t in range(1, params.d + 1) if tail[t] <= params.max_false_accept), None)
+
+
+def check_false_accept(params: ProtocolParams):
+    far = false_accept_rate(params)
+    if far <= params.max_false_accept:
+        return
+    need = min_tbio(params)
+    if need:
+        hint = f'raise tbio to at least {need}'
+    else:
+        hint = f'no tbio <= d={params.d} reaches it; use more bins or a larger d'
+    raise ValueError(
+        f'bins={params.bins}, tbio={params.tbio}: an unrelated biometric is accepted with probability '
+        f'{far:.3g} (limit {params.max_false_accept:g}); {hint}'
+    )
+
+
+def feature_keys(params: ProtocolParams, biometric) -> list:
+    if params.bins:
+        return encoder(params).encode(biometric[: params.d])
+    # repr() keys keep -0.0 and 0.0 apart, exactly as H0 hashes them
+    return [repr(float(biometric[i])) for i in range(params.d)]
+
+
+def hash_feature(params: ProtocolParams, key, c: bytes) -> int:
+    return H0q(key, c) if params.bins else H0(float(key), c)
+
+
+def hash_features(params: ProtocolParams, biometric, c: bytes) -> tuple[list, dict]:
+    # one H0 per distinct feature key in this capture
+    keys = feature_keys(params, biometric)
+    return keys, {key: hash_feature(params, key, c) for key in dict.fromkeys(keys)}
+
+
+def feature_zis(M: tuple[int, int], keys: list, hashed: dict) -> list[int]:
+    # one scalar multiplication per distinct key; nothing outlives the call, since
+    # Zi together with the token's A values yields shares of k
+    Z = {key: H1(M, Mw) for key, Mw in zip(hashed, batch_point_mul(M, hashed.values()))}
+    return [Z[key] for key in keys]
+
+
+def match_and_recover(
+    params: ProtocolParams, token: BEKDToken, M: tuple[int, int], keys: list, hashed: dict
+) -> int | None:
+    rho = token.rho
+    Kdec = point_add(token.R1, point_neg(M))
+    Z = feature_zis(M, keys, hashed)
+    matches = []
+    for i in range(1, params.d + 1):
+        Zi = Z[i - 1]
+        if token.tag_matches(i - 1, Htag(i, rho, Zi, token.lambda_bytes)):
+            matches.append((i, Zi))
+    if len(matches) < params.tbio:
+        return None
+
+    selected = matches[: params.tbio]
+    points = [(i, (token.a(i - 1) - Zi) % N) for i, Zi in selected]
+    k = interpolate_zero(points)
+    if point_mul(k) != Kdec:
+        return None
+    return k
+
+
+def sign_user_op(k: int, rho: bytes, user_op_hash: bytes) -> bool:
+    owner_addr = keys_from_scalar(k).public_key.to_canonical_address()
+    typed = eip712_typed_hash(rho, user_op_hash, 31337, b'wallet-address-123456')
+    sig = sign_hash(k, typed)
+    return recover_signer(typed, sig) == owner_addr
+
+
 def keys_from_scalar(k: int):
     from eth_keys import keys
 
     return keys.PrivateKey(k.to_bytes(32, 'big'))
 
 
+def default_biometric(d: int):
+    from wallet.biometric_sim import generate_biometric
+
+    return generate_biometric(d, seed=7)
+
+
+def simulated_capture(d: int):
+    # the CLI always enrolls the default template, so the capture is re-derived from it
+    from wallet.biometric_sim import generate_noisy_biometric
+
+    return generate_noisy_biometric(default_biometric(d), match_ratio=0.96, seed=9)
+
+
+def process_age_ms() -> float | None:
+    # wall time since the kernel started this process, interpreter start-up included;
+    # Linux only and in clock ticks (usually 10 ms)
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return (uptime - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000
+
+
+def _fmt_ms(ms: float | None) -> str:
+    return f'{ms:.0f}ms' if ms is not None else '-'
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--action', required=True, choices=['enroll', 'retrieve', 'authenticate'])
+    parser.add_argument('--snapshot', type=Path, default=SNAPSHOT_FILE, help='cached consortium/params snapshot')
+    parser.add_argument('--timing', action='store_true', help='report start-up time against work time')
     args = parser.parse_args()
 
-    wallet = BEKDWallet()
+    st = time.perf_counter()
+    wallet = BEKDWallet.from_snapshot(args.snapshot)
+    load_ms = (time.perf_counter() - st) * 1000
+
+    st = time.perf_counter()
     if args.action == 'enroll':
         token = wallet.enroll()
-        print(f"enrolled rho={token['TU']['rho']}")
+        print(f"enrolled rho={token.rho.hex()}")
     elif args.action == 'retrieve':
-        token = load_token()
-        base = token['biometric']
-        noisy = generate_noisy_biometric(__import__('numpy').array(base), match_ratio=0.96, seed=9)
-        k = wallet.retrieve(noisy)
+        k = wallet.retrieve(simulated_capture(wallet.params.d))
         print('retrieve', 'ok' if k else 'failed')
     else:
-        token = load_token()
-        base = token['biometric']
-        noisy = generate_noisy_biometric(__import__('numpy').array(base), match_ratio=0.96, seed=9)
-        k = wallet.retrieve(noisy)
+        k = wallet.retrieve(simulated_capture(wallet.params.d))
         print('auth', wallet.authenticate(k) if k else False)
+    work_ms = (time.perf_counter() - st) * 1000
+
+    if args.timing:
+        lazy = [m for m in ('numpy', 'eth_keys', 'py_ecc') if m in sys.modules]
+        print(
+            f"timing imports={_IMPORT_MS:.1f}ms snapshot={load_ms:.1f}ms work={work_ms:.1f}ms "
+            f"since_exec={_fmt_ms(process_age_ms())} lazy_imports={','.join(lazy) or '-'}"
+        )
 
 
 if __name__ == '__main__':
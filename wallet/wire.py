@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from wallet.bekd_crypto import Point, compress_point, serialize_int
+from wallet.token_storage import BEKDToken
+
+# Binary wire format shared by the CA nodes and the wallet: one version byte,
+# then fields of <u32 big-endian length><bytes>. Points are 33-byte compressed,
+# scalars 32-byte big-endian. JSON stays available for debugging.
+CONTENT_TYPE = "application/x-bekd"
+JSON_TYPE = "application/json"
+WIRE_VERSION = 1
+# nodes cache one helper per (rho, request id), so ids are capped to keep that cache small
+MAX_REQUEST_ID_BYTES = 64
+
+
+def pack(*fields: bytes) -> bytes:
+    out = bytearray([WIRE_VERSION])
+    for field in fields:
+        out += len(field).to_bytes(4, "big")
+        out += field
+    return bytes(out)
+
+
+def unpack(data: bytes, count: int) -> list[bytes]:
+    if not data or data[0] != WIRE_VERSION:
+        raise ValueError("unsupported wire version")
+    view = memoryview(data)
+    fields, pos = [], 1
+    for _ in range(count):
+        size = int.from_bytes(view[pos : pos + 4], "big")
+        pos += 4
+        if pos + size > len(data):
+            raise ValueError("truncated wire message")
+        fields.append(bytes(view[pos : pos + size]))
+        pos += size
+    if pos != len(data):
+        raise ValueError("trailing bytes in wire message")
+    return fields
+
+
+def _fixed(field: bytes, size: int, name: str) -> bytes:
+    if len(field) != size:
+        raise ValueError(f"{name} must be {size} bytes")
+    return field
+
+
+def encode_retrieve_request(rho: bytes, R0: tuple[int, int], request_id: str | None = None) -> bytes:
+    return pack(rho, compress_point(R0), (request_id or "").encode())
+
+
+def check_request_id(request_id) -> str | None:
+    if request_id is None or request_id == "":
+        return None
+    if not isinstance(request_id, str) or len(request_id.encode()) > MAX_REQUEST_ID_BYTES:
+        raise ValueError(f"request_id must be a string of at most {MAX_REQUEST_ID_BYTES} bytes")
+    return request_id
+
+
+def decode_retrieve_request(data: bytes) -> tuple[bytes, Point, str | None]:
+    rho, R0, request_id = unpack(data, 3)
+    if len(request_id) > MAX_REQUEST_ID_BYTES:
+        raise ValueError(f"request_id must be a string of at most {MAX_REQUEST_ID_BYTES} bytes")
+    return _fixed(rho, 32, "rho"), Point.from_compressed(R0), check_request_id(request_id.decode())
+
+
+def encode_retrieve_response(node: int, helper: tuple[int, int]) -> bytes:
+    return pack(node.to_bytes(2, "big"), compress_point(helper))
+
+
+def decode_retrieve_response(data: bytes) -> tuple[int, Point]:
+    node, helper = unpack(data, 2)
+    return int.from_bytes(_fixed(node, 2, "node"), "big"), Point.from_compressed(helper)
+
+
+def encode_enroll_request(hA: int) -> bytes:
+    return pack(serialize_int(hA))
+
+
+def decode_enroll_request(data: bytes) -> int:
+    (hA,) = unpack(data, 1)
+    return int.from_bytes(_fixed(hA, 32, "hA"), "big")
+
+
+def encode_enroll_response(node: int, partial_sig: int) -> bytes:
+    return pack(node.to_bytes(2, "big"), serialize_int(partial_sig))
+
+
+def decode_enroll_response(data: bytes) -> tuple[int, int]:
+    node, partial_sig = unpack(data, 2)
+    return int.from_bytes(_fixed(node, 2, "node"), "big"), int.from_bytes(_fixed(partial_sig, 32, "partial_sig"), "big")
+
+
+def encode_token(token: BEKDToken) -> bytes:
+    return pack(
+        token.c,
+        token.rho,
+        compress_point(token.R0),
+        compress_point(token.R1),
+        serialize_int(token.hA),
+        token.sigma,
+        token.A,
+        token.tags,
+        token.lambda_bytes.to_bytes(1, "big"),
+    )
+
+
+def decode_token(data: bytes) -> BEKDToken:
+    c, rho, R0, R1, hA, sigma, A, tags, lam = unpack(data, 9)
+    lambda_bytes = int.from_bytes(_fixed(lam, 1, "lambda"), "big")
+    if len(A) % 32 or len(tags) != lambda_bytes * (len(A) // 32):
+        raise ValueError("A and tags lengths disagree")
+    return BEKDToken(
+        c=c,
+        rho=_fixed(rho, 32, "rho"),
+        R0=Point.from_compressed(R0),
+        R1=Point.from_compressed(R1),
+        hA=int.from_bytes(_fixed(hA, 32, "hA"), "big"),
+        sigma=sigma,
+        A=A,
+        tags=tags,
+        lambda_bytes=lambda_bytes,
+    )